@@ -0,0 +1,43 @@
+"""reservation overlap exclusion constraint
+
+Revision ID: 7c3a5e8d1b62
+Revises: 2e7c8b5d9a14
+Create Date: 2026-10-18 15:37:44.071259
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3a5e8d1b62'
+down_revision = '2e7c8b5d9a14'
+branch_labels = None
+depends_on = None
+
+# Debe coincidir con RESERVATION_DURATION_MINUTES (api/availability.py)
+SEATING_MINUTES = 120
+
+
+def upgrade():
+    # Solo PostgreSQL: en SQLite el chequeo con bloqueo de api.availability.find_conflict
+    # es la única protección. Falla si ya hay reservas activas superpuestas en la misma mesa.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(f"""
+        ALTER TABLE reservations ADD CONSTRAINT reservations_no_overlap
+        EXCLUDE USING gist (
+            table_id WITH =,
+            tsrange(start_date_time, start_date_time + interval '{SEATING_MINUTES} minutes') WITH &&
+        )
+        WHERE (table_id IS NOT NULL AND status IN ('PENDIENTE', 'CONFIRMADA'))
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE reservations DROP CONSTRAINT IF EXISTS reservations_no_overlap')
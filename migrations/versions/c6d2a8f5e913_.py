@@ -0,0 +1,136 @@
+"""reservations end_date_time and overlap trigger for combined tables
+
+Revision ID: c6d2a8f5e913
+Revises: 9b1f4e7c2d58
+Create Date: 2026-10-18 21:12:09.406173
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d2a8f5e913'
+down_revision = '9b1f4e7c2d58'
+branch_labels = None
+depends_on = None
+
+# Las reservas existentes terminan según la duración configurada al migrar (api/availability.py)
+SEATING_MINUTES = int(os.getenv("RESERVATION_DURATION_MINUTES", 120))
+
+# Revisa la reserva contra todas las mesas que ocupa (principal y combinadas) y contra las
+# mesas combinadas de las demás, que la restricción de exclusión no ve. El advisory lock por
+# mesa serializa las reservas concurrentes de las mismas mesas hasta el commit.
+CHECK_FUNCTION = """
+CREATE OR REPLACE FUNCTION reservations_check_tables() RETURNS trigger AS $$
+DECLARE
+    res reservations%ROWTYPE;
+    occupied integer[];
+    conflict_id integer;
+BEGIN
+    IF TG_TABLE_NAME = 'reservations' THEN
+        res := NEW;
+    ELSE
+        SELECT * INTO res FROM reservations WHERE id = NEW.reservation_id;
+    END IF;
+    IF res.id IS NULL OR res.status NOT IN ('PENDIENTE', 'CONFIRMADA') THEN
+        RETURN NEW;
+    END IF;
+
+    occupied := ARRAY(SELECT table_id FROM reservation_extra_tables WHERE reservation_id = res.id);
+    IF TG_TABLE_NAME = 'reservation_extra_tables' THEN
+        occupied := occupied || NEW.table_id;
+    END IF;
+    IF res.table_id IS NOT NULL THEN
+        occupied := occupied || res.table_id;
+    END IF;
+    IF cardinality(occupied) = 0 THEN
+        RETURN NEW;
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('reservation_tables'), t)
+    FROM (SELECT DISTINCT unnest(occupied) AS t ORDER BY 1) AS locked;
+
+    SELECT r.id INTO conflict_id FROM reservations r
+    WHERE r.id <> res.id
+      AND r.status IN ('PENDIENTE', 'CONFIRMADA')
+      AND r.start_date_time < res.end_date_time
+      AND r.end_date_time > res.start_date_time
+      AND (r.table_id = ANY(occupied) OR EXISTS (
+          SELECT 1 FROM reservation_extra_tables e
+          WHERE e.reservation_id = r.id AND e.table_id = ANY(occupied)))
+    ORDER BY r.start_date_time
+    LIMIT 1;
+
+    IF conflict_id IS NOT NULL THEN
+        RAISE EXCEPTION 'reservations_no_overlap: reserva % ocupa la mesa en ese horario', conflict_id
+            USING ERRCODE = 'exclusion_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    # add_column directo en lugar de batch_alter_table: en SQLite el batch recrea la tabla y se
+    # pierden los triggers FTS5 de reservations_search (f3a9d7c1b284). SQLite solo acepta un
+    # NOT NULL nuevo con default, que se completa enseguida con el fin real.
+    op.add_column('reservations', sa.Column(
+        'end_date_time', sa.DateTime(), server_default='1970-01-01 00:00:00', nullable=False))
+
+    postgres = op.get_bind().dialect.name == 'postgresql'
+
+    if postgres:
+        op.execute(f"UPDATE reservations SET end_date_time = start_date_time + interval '{SEATING_MINUTES} minutes'")
+    else:
+        op.execute(f"UPDATE reservations SET end_date_time = datetime(start_date_time, '+{SEATING_MINUTES} minutes')")
+
+    if not postgres:
+        return
+
+    # La aplicación siempre calcula el fin (api/availability.py); el default era solo para agregar la columna
+    op.alter_column('reservations', 'end_date_time', server_default=None)
+
+    # La restricción pasa a usar el fin guardado en lugar de una duración fija
+    op.execute('ALTER TABLE reservations DROP CONSTRAINT IF EXISTS reservations_no_overlap')
+    op.execute("""
+        ALTER TABLE reservations ADD CONSTRAINT reservations_no_overlap
+        EXCLUDE USING gist (
+            table_id WITH =,
+            tsrange(start_date_time, end_date_time) WITH &&
+        )
+        WHERE (table_id IS NOT NULL AND status IN ('PENDIENTE', 'CONFIRMADA'))
+    """)
+
+    op.execute(CHECK_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER reservations_check_tables
+        BEFORE INSERT OR UPDATE OF table_id, start_date_time, end_date_time, status ON reservations
+        FOR EACH ROW EXECUTE FUNCTION reservations_check_tables()
+    """)
+    op.execute("""
+        CREATE TRIGGER reservation_extra_tables_check_tables
+        BEFORE INSERT OR UPDATE ON reservation_extra_tables
+        FOR EACH ROW EXECUTE FUNCTION reservations_check_tables()
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS reservation_extra_tables_check_tables ON reservation_extra_tables')
+        op.execute('DROP TRIGGER IF EXISTS reservations_check_tables ON reservations')
+        op.execute('DROP FUNCTION IF EXISTS reservations_check_tables()')
+        op.execute('ALTER TABLE reservations DROP CONSTRAINT IF EXISTS reservations_no_overlap')
+        op.execute("""
+            ALTER TABLE reservations ADD CONSTRAINT reservations_no_overlap
+            EXCLUDE USING gist (
+                table_id WITH =,
+                tsrange(start_date_time, start_date_time + interval '120 minutes') WITH &&
+            )
+            WHERE (table_id IS NOT NULL AND status IN ('PENDIENTE', 'CONFIRMADA'))
+        """)
+
+    # Sin batch por el mismo motivo que en upgrade (SQLite >= 3.35 tiene DROP COLUMN)
+    op.drop_column('reservations', 'end_date_time')
@@ -0,0 +1,86 @@
+"""search keys, pg_trgm indexes and sqlite fts5 tables
+
+Revision ID: f3a9d7c1b284
+Revises: d81f6c2a4e57
+Create Date: 2026-10-18 17:22:40.615203
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9d7c1b284'
+down_revision = 'd81f6c2a4e57'
+branch_labels = None
+depends_on = None
+
+# (tabla, campos de búsqueda, tabla FTS5 de SQLite); ver api/search.py
+SEARCH_TABLES = (
+    ('users', ('name', 'last_name', 'email'), 'users_search'),
+    ('reservations', ('guest_name', 'email'), 'reservations_search'),
+)
+
+
+def normalize(*values):
+    # Copia de api.search.normalize: las migraciones no importan la aplicación
+    joined = " ".join(value for value in values if value)
+    decomposed = unicodedata.normalize("NFKD", joined)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def upgrade():
+    for table_name, _, _ in SEARCH_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('search_key', sa.String(length=400), server_default='', nullable=False))
+
+    bind = op.get_bind()
+    for table_name, fields, _ in SEARCH_TABLES:
+        table = sa.table(table_name, sa.column('id'), sa.column('search_key'), *(sa.column(f) for f in fields))
+        rows = bind.execute(sa.select(table.c.id, *(table.c[f] for f in fields))).all()
+        for start in range(0, len(rows), 1000):
+            bind.execute(
+                table.update().where(table.c.id == sa.bindparam('row_id')).values(search_key=sa.bindparam('key')),
+                [{'row_id': row[0], 'key': normalize(*row[1:])} for row in rows[start:start + 1000]]
+            )
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table_name, _, _ in SEARCH_TABLES:
+            op.execute(f'CREATE INDEX ix_{table_name}_search_key_trgm ON {table_name} '
+                       f'USING gin (search_key gin_trgm_ops)')
+
+    elif bind.dialect.name == 'sqlite':
+        for table_name, _, fts_table in SEARCH_TABLES:
+            op.execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                       f"search_key, content='{table_name}', content_rowid='id', "
+                       f"tokenize='unicode61 remove_diacritics 2')")
+            op.execute(f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table_name} BEGIN "
+                       f"INSERT INTO {fts_table}(rowid, search_key) VALUES (new.id, new.search_key); END")
+            op.execute(f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table_name} BEGIN "
+                       f"INSERT INTO {fts_table}({fts_table}, rowid, search_key) "
+                       f"VALUES ('delete', old.id, old.search_key); END")
+            op.execute(f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF search_key ON {table_name} BEGIN "
+                       f"INSERT INTO {fts_table}({fts_table}, rowid, search_key) "
+                       f"VALUES ('delete', old.id, old.search_key); "
+                       f"INSERT INTO {fts_table}(rowid, search_key) VALUES (new.id, new.search_key); END")
+            op.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table_name, _, _ in SEARCH_TABLES:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table_name}_search_key_trgm')
+
+    elif bind.dialect.name == 'sqlite':
+        for _, _, fts_table in SEARCH_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+    for table_name, _, _ in reversed(SEARCH_TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('search_key')
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta
+from flask import render_template
+from sqlalchemy import select, update, func
+from api.models import db, AdminNotification
+from api.outbox import queue_email
+
+# Resumen de avisos al admin (reservas, contacto) en lugar de un correo por evento.
+# Los avisos se guardan en admin_notifications y se envían juntos en un solo correo
+# cuando el más viejo tiene ADMIN_DIGEST_MINUTES o se juntan ADMIN_DIGEST_MAX_EVENTS.
+# Las categorías de ADMIN_DIGEST_URGENT se siguen enviando al momento.
+# ADMIN_DIGEST_MINUTES=0 desactiva el resumen.
+#
+# Además de notify_admin, revisan si toca enviar el resumen `flask email-worker`
+# en cada vuelta y `flask send-admin-digest` (para cron).
+
+DIGEST_INTERVAL = timedelta(minutes=int(os.getenv("ADMIN_DIGEST_MINUTES", 30)))
+DIGEST_MAX_EVENTS = int(os.getenv("ADMIN_DIGEST_MAX_EVENTS", 50))
+URGENT_CATEGORIES = {
+    category.strip() for category in os.getenv("ADMIN_DIGEST_URGENT", "reserva_proxima").split(",") if category.strip()
+}
+
+CATEGORY_LABELS = {
+    "reserva": "Reservas",
+    "reserva_proxima": "Reservas para las próximas horas",
+    "contacto": "Mensajes de contacto",
+}
+
+
+def notify_admin(category, subject, html_body, summary):
+    """Encola el aviso al admin: al momento si es urgente o el resumen está desactivado, si no al resumen."""
+    admin_email = os.getenv("MAIL_USERNAME")
+
+    if not DIGEST_INTERVAL or category in URGENT_CATEGORIES:
+        return queue_email(admin_email, subject, html_body, is_html=True)
+
+    try:
+        db.session.add(AdminNotification(
+            category=category, subject=subject, summary=summary, created_at=datetime.now()))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print("❌ Error al guardar aviso para el resumen:", e)
+        # Mejor un correo individual que perder el aviso
+        return queue_email(admin_email, subject, html_body, is_html=True)
+
+    flush_digest()
+    return True
+
+
+def flush_digest(force=False):
+    """Envía el resumen si ya toca (o siempre con `force`). Devuelve la cantidad de avisos incluidos."""
+    pending, oldest = db.session.execute(
+        select(func.count(), func.min(AdminNotification.created_at))
+        .where(AdminNotification.digest_sent_at.is_(None))
+    ).one()
+
+    if not pending:
+        return 0
+    if not force and pending < DIGEST_MAX_EVENTS and oldest > datetime.now() - DIGEST_INTERVAL:
+        return 0
+
+    # Reclamar los avisos con un UPDATE: si dos procesos llegan a la vez, cada aviso sale en un solo resumen
+    now = datetime.now()
+    rows = db.session.execute(
+        update(AdminNotification)
+        .where(AdminNotification.digest_sent_at.is_(None))
+        .values(digest_sent_at=now)
+        .returning(AdminNotification.category, AdminNotification.subject,
+                   AdminNotification.summary, AdminNotification.created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    sections = {}
+    for category, subject, summary, created_at in sorted(rows, key=lambda row: row.created_at):
+        sections.setdefault(category, []).append(
+            {"subject": subject, "summary": summary, "time": created_at.strftime("%Y-%m-%d %H:%M")})
+
+    html_body = render_template(
+        "email_admin_digest.html",
+        total=len(rows),
+        sections=[(CATEGORY_LABELS.get(category, category), items) for category, items in sections.items()],
+        since=min(row.created_at for row in rows).strftime("%Y-%m-%d %H:%M"),
+        until=now.strftime("%Y-%m-%d %H:%M")
+    )
+
+    # En modo outbox queue_email hace commit: los avisos reclamados y el correo quedan en la misma transacción
+    if not queue_email(os.getenv("MAIL_USERNAME"), f"Resumen: {len(rows)} avisos nuevos", html_body, is_html=True):
+        db.session.rollback()
+        return 0
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,194 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import MetaData, Table, Column, Index, DateTime, select, insert, delete, union_all, literal, text
+from api.models import db, Order, OrderDetail, OrderArchive, User, order_status
+from api.counters import ORDERS, apply_deltas
+from api.read_models import OrderRecord, OrderLine
+
+# Archivo de órdenes terminadas en tablas mensuales (orders_archive_YYYY_MM y
+# order_details_archive_YYYY_MM) para que las tablas calientes sigan siendo chicas.
+# En PostgreSQL, con partitioned=True, las tablas mensuales son particiones por rango de
+# created_at de orders_archive / order_details_archive.
+
+ARCHIVABLE_STATUSES = (order_status.COMPLETADA, order_status.CANCELADA)
+
+_metadata = MetaData()
+
+
+def parse_age(value):
+    """'90d' -> timedelta(days=90). Acepta días (d) y semanas (w)."""
+    match = re.fullmatch(r"(\d+)([dw])", value.strip().lower())
+    if not match:
+        raise ValueError("Formato inválido, usa por ejemplo 90d o 12w")
+    amount, unit = int(match.group(1)), match.group(2)
+    return timedelta(days=amount * (7 if unit == "w" else 1))
+
+
+def _copy_table(source, name, extra=()):
+    if name in _metadata.tables:
+        return _metadata.tables[name]
+
+    # Mismas columnas que la tabla caliente pero sin FKs ni restricciones únicas
+    columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False)
+               for c in source.columns]
+    return Table(name, _metadata, *columns, *extra)
+
+
+def archive_tables(suffix):
+    orders = _copy_table(Order.__table__, f"orders_archive{suffix}")
+    details_name = f"order_details_archive{suffix}"
+    details = _copy_table(OrderDetail.__table__, details_name, [
+        Column("order_created_at", DateTime(), nullable=False),
+        Index(f"ix_{details_name}_order_id", "order_id")
+    ])
+    return orders, details
+
+
+def _month_bounds(month):
+    start = datetime.strptime(month, "%Y_%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def ensure_archive_tables(connection, month, partitioned=False):
+    orders, details = archive_tables(f"_{month}")
+
+    if partitioned:
+        start, end = _month_bounds(month)
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS orders_archive (LIKE orders INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"))
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS order_details_archive (LIKE order_details INCLUDING DEFAULTS, "
+            "order_created_at TIMESTAMP NOT NULL) PARTITION BY RANGE (order_created_at)"))
+        for parent, table in (("orders_archive", orders), ("order_details_archive", details)):
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table.name} PARTITION OF {parent} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"))
+    else:
+        orders.create(connection, checkfirst=True)
+        details.create(connection, checkfirst=True)
+
+    if db.session.get(OrderArchive, month) is None:
+        db.session.add(OrderArchive(month=month, orders_table=orders.name,
+                                    details_table=details.name, partitioned=partitioned))
+    return orders, details
+
+
+def archive_orders(older_than, batch_size=1000, partitioned=False):
+    """Mueve órdenes completadas/canceladas más viejas que `older_than` al archivo, por lotes."""
+    cutoff = datetime.now() - older_than
+    orders_table = Order.__table__
+    details_table = OrderDetail.__table__
+    moved = 0
+
+    while True:
+        batch = db.session.execute(
+            select(Order.id, Order.status, Order.created_at)
+            .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.created_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return moved
+
+        connection = db.session.connection()
+        by_month = {}
+        deltas = {}
+        for order_id, status, created_at in batch:
+            by_month.setdefault(created_at.strftime("%Y_%m"), []).append(order_id)
+            key = (ORDERS, status.name, "")
+            deltas[key] = deltas.get(key, 0) - 1
+
+        for month, ids in by_month.items():
+            archived_orders, archived_details = ensure_archive_tables(connection, month, partitioned)
+
+            connection.execute(insert(archived_orders).from_select(
+                [c.name for c in orders_table.columns],
+                select(*orders_table.columns).where(orders_table.c.id.in_(ids))
+            ))
+            connection.execute(insert(archived_details).from_select(
+                [c.name for c in details_table.columns] + ["order_created_at"],
+                select(*details_table.columns, orders_table.c.created_at)
+                .join(orders_table, orders_table.c.id == details_table.c.order_id)
+                .where(details_table.c.order_id.in_(ids))
+            ))
+
+        ids = [row.id for row in batch]
+        connection.execute(delete(details_table).where(details_table.c.order_id.in_(ids)))
+        connection.execute(delete(orders_table).where(orders_table.c.id.in_(ids)))
+        # El DELETE masivo no pasa por before_flush: las órdenes archivadas salen de los contadores
+        apply_deltas(connection, deltas)
+        db.session.commit()
+
+        moved += len(batch)
+        print(f"Archivadas {moved} órdenes")
+
+
+def order_sources():
+    """(tabla de órdenes, tabla de detalles) para la tabla caliente y cada archivo registrado."""
+    sources = [(Order.__table__, OrderDetail.__table__)]
+    archives = db.session.scalars(select(OrderArchive).order_by(OrderArchive.month)).all()
+
+    if any(archive.partitioned for archive in archives):
+        # Con particiones basta consultar las tablas padre; PostgreSQL poda los meses
+        sources.append(archive_tables(""))
+        archives = [archive for archive in archives if not archive.partitioned]
+
+    sources.extend(archive_tables(archive.orders_table[len("orders_archive"):]) for archive in archives)
+    return sources
+
+
+def orders_union(search=None, statuses=None):
+    """select() sobre la unión de órdenes calientes y archivadas con los filtros del listado."""
+    selects = []
+    for index, (orders, _) in enumerate(order_sources()):
+        stmt = select(
+            orders.c.id, orders.c.order_code, orders.c.user_id, orders.c.status,
+            orders.c.total, orders.c.created_at, literal(index).label("source")
+        )
+        if search:
+            stmt = stmt.where(orders.c.user_id.in_(select(User.id).where(User.email.ilike(f"%{search}%"))))
+        if statuses:
+            stmt = stmt.where(orders.c.status.in_(statuses))
+        selects.append(stmt)
+
+    union = union_all(*selects).subquery()
+    return select(union)
+
+
+def fetch_archived_order_records(stmt, offset=None, limit=None):
+    """Pagina sobre orders_union() y arma OrderRecord leyendo los detalles de cada tabla de origen."""
+    union = stmt.subquery()
+    rows = db.session.execute(
+        select(union).order_by(union.c.created_at.desc(), union.c.id.desc()).offset(offset).limit(limit)
+    ).all()
+    if not rows:
+        return []
+
+    sources = order_sources()
+    user_ids = {row.user_id for row in rows if row.user_id is not None}
+    users = {
+        user_id: f"{name} {last_name}"
+        for user_id, name, last_name in db.session.execute(
+            select(User.id, User.name, User.last_name).where(User.id.in_(user_ids)))
+    } if user_ids else {}
+
+    records = {}
+    ids_by_source = {}
+    for row in rows:
+        records[row.id] = OrderRecord(
+            row.id, row.order_code, row.user_id, users.get(row.user_id, "Invitado"),
+            order_status[row.status] if isinstance(row.status, str) else row.status,
+            row.total, row.created_at)
+        ids_by_source.setdefault(row.source, []).append(row.id)
+
+    for source, ids in ids_by_source.items():
+        details = sources[source][1]
+        for order_id, product_name, quantity, unit_price in db.session.execute(
+                select(details.c.order_id, details.c.product_name, details.c.quantity, details.c.unit_price)
+                .where(details.c.order_id.in_(ids))
+                .order_by(details.c.id)):
+            records[order_id].details.append(OrderLine(product_name, quantity, unit_price))
+
+    return list(records.values())
@@ -0,0 +1,171 @@
+import os
+import time
+import bisect
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_, event, inspect
+from api.models import db, Reservation, ReservationExtraTable, Table, reservation_status
+
+# Disponibilidad de mesas a partir de las reservas.
+# Cada reserva guarda su fin (end_date_time) al crearse o moverse, y todo compara contra ese
+# fin guardado: el índice por día, find_conflict y la restricción de la base. Así cambiar
+# RESERVATION_DURATION_MINUTES no cambia qué se considera superpuesto para las reservas existentes.
+# Por cada día se arma un índice {mesa: intervalos ordenados por inicio} con el fin máximo
+# acumulado: basta mirar el intervalo anterior al fin pedido, O(log n) por mesa.
+
+SEATING_DURATION = timedelta(minutes=int(os.getenv("RESERVATION_DURATION_MINUTES", 120)))
+ACTIVE_STATUSES = (reservation_status.PENDIENTE, reservation_status.CONFIRMADA)
+
+
+@event.listens_for(Reservation, "before_insert")
+@event.listens_for(Reservation, "before_update")
+def _set_end_date_time(mapper, connection, target):
+    if target.end_date_time is None or inspect(target).attrs.start_date_time.history.has_changes():
+        target.end_date_time = target.start_date_time + SEATING_DURATION
+
+
+class DayIndex:
+    __slots__ = ("tables", "slots", "expires_at")
+
+    def __init__(self, tables, intervals, expires_at):
+        self.tables = tables
+        # mesa -> (inicios ordenados, fines en el mismo orden, fin máximo hasta cada posición)
+        self.slots = {}
+        self.expires_at = expires_at
+        for table_id, start, end in intervals:
+            self.add(table_id, start, end)
+
+    def add(self, table_id, start, end):
+        starts, ends, reach = self.slots.setdefault(table_id, ([], [], []))
+        index = bisect.bisect_right(starts, start)
+        starts.insert(index, start)
+        ends.insert(index, end)
+        reach.insert(index, end)
+        self._update_reach(ends, reach, index)
+
+    def remove(self, table_id, start, end):
+        starts, ends, reach = self.slots[table_id]
+        index = bisect.bisect_left(starts, start)
+        while ends[index] != end:
+            index += 1
+        del starts[index], ends[index], reach[index]
+        self._update_reach(ends, reach, index)
+
+    @staticmethod
+    def _update_reach(ends, reach, index):
+        for position in range(index, len(ends)):
+            reach[position] = max(ends[position], reach[position - 1]) if position else ends[position]
+
+    def is_free(self, table_id, start, end):
+        slots = self.slots.get(table_id)
+        if not slots:
+            return True
+        starts, _, reach = slots
+        # Entre las reservas que empiezan antes de que termine el turno pedido, ninguna termina después de que empiece
+        index = bisect.bisect_left(starts, end)
+        return index == 0 or reach[index - 1] <= start
+
+
+class AvailabilityIndex:
+    def __init__(self, duration=SEATING_DURATION, ttl=30):
+        self.duration = duration
+        # Otros workers invalidan su propia copia; el TTL acota cuánto puede durar una copia vieja
+        self.ttl = ttl
+        self._days = {}
+        self._lock = threading.Lock()
+        # Sube con cada invalidación: un índice armado mientras tanto puede no ver la reserva nueva
+        self._generation = 0
+
+    def _build(self, day):
+        # Turnos que empiezan ese día: chocan con las reservas que terminan después de medianoche
+        # y con las que empiezan antes del fin del último turno (incluidas las de la noche anterior)
+        start = datetime.combine(day, datetime.min.time())
+        end = datetime.combine(day + timedelta(days=1), datetime.min.time()) + self.duration
+
+        tables = db.session.execute(
+            select(Table.id, Table.number, Table.chairs).order_by(Table.chairs, Table.number)
+        ).all()
+
+        in_window = (
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.end_date_time > start,
+            Reservation.start_date_time < end
+        )
+        intervals = db.session.execute(
+            select(Reservation.table_id, Reservation.start_date_time, Reservation.end_date_time)
+            .where(Reservation.table_id.is_not(None), *in_window)
+        ).all()
+
+        # Mesas combinadas: las adicionales quedan ocupadas igual que la principal
+        intervals += db.session.execute(
+            select(ReservationExtraTable.table_id, Reservation.start_date_time, Reservation.end_date_time)
+            .join(Reservation, Reservation.id == ReservationExtraTable.reservation_id)
+            .where(*in_window)
+        ).all()
+
+        return DayIndex(tables, sorted(intervals, key=lambda row: row[1]), time.monotonic() + self.ttl)
+
+    def day(self, day):
+        index = self._days.get(day)
+        if index is None or index.expires_at <= time.monotonic():
+            generation = self._generation
+            index = self._build(day)
+            with self._lock:
+                # Si hubo una invalidación durante el armado, este índice se usa una vez pero no se guarda
+                if generation == self._generation:
+                    self._days[day] = index
+        return index
+
+    def available_tables(self, start, party):
+        index = self.day(start.date())
+        return [
+            {"id": table_id, "number": number, "chairs": chairs}
+            for table_id, number, chairs in index.tables
+            if chairs >= party and index.is_free(table_id, start, start + self.duration)
+        ]
+
+    def invalidate(self, *moments):
+        """Descarta los días afectados por una reserva (o todos si no se indica ninguno)."""
+        with self._lock:
+            self._generation += 1
+            if not moments:
+                self._days.clear()
+                return
+            for moment in moments:
+                if moment is None:
+                    continue
+                # Una reserva afecta su día y, si cruza la medianoche, los vecinos
+                for offset in (-1, 0, 1):
+                    self._days.pop(moment.date() + timedelta(days=offset), None)
+
+
+availability = AvailabilityIndex(ttl=int(os.getenv("AVAILABILITY_CACHE_TTL", 30)))
+
+
+def find_conflict(table_id, start, exclude_id=None, duration=SEATING_DURATION):
+    """
+    Bloquea la mesa y devuelve una reserva activa que se superpone con [start, start + duration),
+    o None. El bloqueo (UPDATE sin cambios sobre la fila de la mesa) serializa las reservas
+    concurrentes de la misma mesa hasta el commit: lock de fila en PostgreSQL, lock de
+    escritura de la base en SQLite. En PostgreSQL además lo garantizan la restricción
+    reservations_no_overlap y el trigger que cubre las mesas combinadas.
+    """
+    with db.session.no_autoflush:
+        db.session.execute(
+            update(Table).where(Table.id == table_id).values(id=Table.id)
+            .execution_options(synchronize_session=False)
+        )
+
+        stmt = select(Reservation).where(
+            or_(
+                Reservation.table_id == table_id,
+                Reservation.id.in_(
+                    select(ReservationExtraTable.reservation_id).where(ReservationExtraTable.table_id == table_id))
+            ),
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.start_date_time < start + duration,
+            Reservation.end_date_time > start
+        )
+        if exclude_id is not None:
+            stmt = stmt.where(Reservation.id != exclude_id)
+        return db.session.scalar(stmt.order_by(Reservation.start_date_time).limit(1))
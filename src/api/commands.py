@@ -31,4 +31,135 @@ def setup_commands(app):
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    @app.cli.command("rebuild-counters")
+    def rebuild_counters_command():
+        """Recalcula los contadores de órdenes y reservas por estado: $ flask rebuild-counters"""
+        from api.counters import rebuild_counters
+
+        deltas = rebuild_counters()
+        for (scope, status, bucket), total in sorted(deltas.items()):
+            print(scope, status, bucket or "-", total)
+        print("Counters rebuilt")
+
+    @app.cli.command("purge-idempotency-keys")
+    @click.option("--batch-size", default=1000, help="Filas borradas por transacción")
+    def purge_idempotency_keys(batch_size):
+        """Borra las claves de idempotencia vencidas: $ flask purge-idempotency-keys"""
+        from api.idempotency import purge_expired_keys
+
+        purged = purge_expired_keys(batch_size)
+        print("Idempotency keys purged:", purged)
+
+    @app.cli.command("check-order-codes")
+    @click.option("--count", default=10000, help="Códigos a generar")
+    @click.option("--threads", default=16, help="Hilos concurrentes")
+    @click.option("--strategy", type=click.Choice(["configured", "block", "snowflake"]), default="configured")
+    def check_order_codes_command(count, threads, strategy):
+        """Genera códigos en paralelo y verifica que no se repitan: $ flask check-order-codes --count 10000
+        Consume números reales de la secuencia del día (quedan huecos en los códigos)."""
+        from concurrent.futures import ThreadPoolExecutor
+        from api.order_codes import order_codes, BlockSequenceGenerator, SnowflakeGenerator
+
+        generator = {
+            "configured": order_codes,
+            "block": BlockSequenceGenerator(),
+            "snowflake": SnowflakeGenerator()
+        }[strategy]
+
+        def generate(n):
+            with app.app_context():
+                return [generator.next_code() for _ in range(n)]
+
+        per_thread = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            codes = [code for batch in executor.map(generate, per_thread) for code in batch]
+
+        duplicates = len(codes) - len(set(codes))
+        print("Codes generated:", len(codes), "duplicates:", duplicates)
+        if duplicates:
+            raise SystemExit(1)
+
+    @app.cli.command("archive-orders")
+    @click.option("--older-than", default="90d", help="Antigüedad mínima, por ejemplo 90d o 12w")
+    @click.option("--batch-size", default=1000, help="Órdenes movidas por transacción")
+    @click.option("--partitioned", is_flag=True, help="PostgreSQL: usar particiones por rango de created_at")
+    def archive_orders_command(older_than, batch_size, partitioned):
+        """Mueve órdenes completadas y canceladas a tablas mensuales: $ flask archive-orders --older-than 90d"""
+        from api.archive import archive_orders, parse_age
+
+        if partitioned and db.engine.dialect.name != "postgresql":
+            raise click.UsageError("--partitioned solo está disponible en PostgreSQL")
+
+        moved = archive_orders(parse_age(older_than), batch_size, partitioned)
+        print("Orders archived:", moved)
+
+    @app.cli.command("rollup-sales")
+    @click.option("--rebuild", is_flag=True, help="Recalcular desde cero el rango --from/--to")
+    @click.option("--from", "date_from", default=None, help="YYYY-MM-DD (solo con --rebuild)")
+    @click.option("--to", "date_to", default=None, help="YYYY-MM-DD (solo con --rebuild)")
+    def rollup_sales_command(rebuild, date_from, date_to):
+        """Actualiza el resumen diario de ventas desde la última corrida: $ flask rollup-sales"""
+        from datetime import datetime, date
+        from api.sales import rollup_sales, rebuild_sales
+
+        if rebuild:
+            if not date_from:
+                raise click.UsageError("--rebuild requiere --from")
+            start = datetime.strptime(date_from, "%Y-%m-%d").date()
+            end = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else date.today()
+            rebuild_sales(start, end)
+            print("Sales rollup rebuilt from", start, "to", end)
+            return
+
+        watermark = rollup_sales()
+        print("Sales rollup up to", watermark)
+
+    @app.cli.command("assign-tables")
+    @click.option("--date", "day", required=True, help="Noche a asignar, YYYY-MM-DD")
+    @click.option("--reassign", is_flag=True, help="Recalcular también las reservas que ya tienen mesa")
+    @click.option("--exact", type=click.Choice(["auto", "always", "never"]), default="auto",
+                  help="Búsqueda exacta: auto la usa solo con pocas reservas")
+    @click.option("--dry-run", is_flag=True, help="Mostrar el plan sin guardarlo")
+    def assign_tables_command(day, reassign, exact, dry_run):
+        """Asigna mesas a las reservas activas de una noche: $ flask assign-tables --date 2026-10-18"""
+        from datetime import datetime
+        from api.table_assignment import assign_tables
+
+        result = assign_tables(datetime.strptime(day, "%Y-%m-%d").date(), reassign, exact, dry_run)
+        for item in result["assigned"]:
+            print(item["start_date_time"], item["guest_name"], item["quantity"], "->",
+                  "+".join(str(number) for number in item["table_numbers"]))
+        for item in result["unassigned"]:
+            print(item["start_date_time"], item["guest_name"], item["quantity"], "-> sin mesa")
+        print(f"Assigned {len(result['assigned'])}, unassigned {len(result['unassigned'])}, "
+              f"seats wasted {result['seats_wasted']} ({result['solver']}, {result['elapsed_ms']} ms)"
+              + (" [dry run]" if dry_run else ""))
+
+    @app.cli.command("email-worker")
+    @click.option("--threads", default=4, help="Hilos de envío")
+    @click.option("--batch-size", default=20, help="Correos reclamados por hilo en cada vuelta")
+    @click.option("--poll", default=2.0, help="Segundos de espera cuando la outbox está vacía")
+    @click.option("--once", is_flag=True, help="Enviar lo pendiente y terminar")
+    @click.option("--stats", is_flag=True, help="Mostrar cuántos correos hay por estado y terminar")
+    def email_worker_command(threads, batch_size, poll, once, stats):
+        """Envía los correos encolados en email_outbox: $ flask email-worker --threads 4"""
+        from api.outbox import run_email_worker, outbox_stats
+
+        if stats:
+            for status, count in sorted(outbox_stats().items()):
+                print(status, count)
+            return
+
+        totals = run_email_worker(app, threads, batch_size, poll, once)
+        print("Emails sent:", totals["sent"], "failed attempts:", totals["failed"])
+
+    @app.cli.command("send-admin-digest")
+    @click.option("--force", is_flag=True, help="Enviar aunque todavía no toque")
+    def send_admin_digest_command(force):
+        """Envía el resumen de avisos al admin si corresponde: $ flask send-admin-digest"""
+        from api.admin_digest import flush_digest
+
+        sent = flush_digest(force)
+        print("Notifications in digest:", sent)
@@ -0,0 +1,139 @@
+from flask import request
+from sqlalchemy import event, inspect, select, func, update, insert, delete
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from api.models import db, Order, Reservation, StatusCounter, order_status, reservation_status
+
+# Contadores de órdenes por estado y de reservas por estado/día.
+# Se actualizan en before_flush, dentro de la misma transacción que la escritura,
+# así los listados no necesitan un COUNT(*) sobre la consulta filtrada.
+
+ORDERS = "orders"
+RESERVATIONS = "reservations"
+
+COUNT_MODES = ("none", "estimate", "exact")
+
+
+def _counter_key(obj, committed=False):
+    state = inspect(obj)
+
+    def value(attr):
+        if committed:
+            history = state.attrs[attr].history
+            if history.deleted:
+                return history.deleted[0]
+            if history.unchanged:
+                return history.unchanged[0]
+        return getattr(obj, attr)
+
+    if isinstance(obj, Order):
+        status = value("status") or order_status.EN_PROCESO
+        return (ORDERS, status.name, "")
+
+    status = value("status") or reservation_status.PENDIENTE
+    start = value("start_date_time")
+    return (RESERVATIONS, status.name, start.date().isoformat() if start else "")
+
+
+def _add(deltas, key, amount):
+    deltas[key] = deltas.get(key, 0) + amount
+
+
+def apply_deltas(connection, deltas):
+    table = StatusCounter.__table__
+    dialect = connection.dialect.name
+
+    for (scope, status, bucket), delta in deltas.items():
+        if delta == 0:
+            continue
+
+        if dialect in ("postgresql", "sqlite"):
+            upsert = pg_insert if dialect == "postgresql" else sqlite_insert
+            stmt = upsert(table).values(scope=scope, status=status, bucket=bucket, count=delta)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.status, table.c.bucket],
+                set_={"count": table.c.count + delta}
+            )
+            connection.execute(stmt)
+            continue
+
+        result = connection.execute(
+            update(table)
+            .where(table.c.scope == scope, table.c.status == status, table.c.bucket == bucket)
+            .values(count=table.c.count + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(scope=scope, status=status, bucket=bucket, count=delta))
+
+
+@event.listens_for(Session, "before_flush")
+def _track_status_changes(session, flush_context, instances):
+    deltas = {}
+
+    for obj in session.new:
+        if isinstance(obj, (Order, Reservation)):
+            _add(deltas, _counter_key(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, (Order, Reservation)) and session.is_modified(obj):
+            old_key = _counter_key(obj, committed=True)
+            new_key = _counter_key(obj)
+            if old_key != new_key:
+                _add(deltas, old_key, -1)
+                _add(deltas, new_key, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, (Order, Reservation)):
+            _add(deltas, _counter_key(obj, committed=True), -1)
+
+    if any(deltas.values()):
+        apply_deltas(session.connection(), deltas)
+
+
+def counted_total(scope, statuses=None, day=None):
+    stmt = select(func.coalesce(func.sum(StatusCounter.count), 0)).where(StatusCounter.scope == scope)
+    if statuses:
+        stmt = stmt.where(StatusCounter.status.in_([s.name for s in statuses]))
+    if day:
+        stmt = stmt.where(StatusCounter.bucket == day.isoformat())
+    return db.session.scalar(stmt)
+
+
+def list_total(stmt, scope=None, statuses=None, day=None):
+    """
+    Total para un listado paginado según ?count=none|estimate|exact.
+    'estimate' (por defecto) usa los contadores cuando `scope` está definido,
+    es decir cuando los filtros son solo de estado/día; si no, hace el COUNT exacto.
+    """
+    mode = request.args.get("count", "estimate").lower().strip()
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Parámetro count inválido. Usa uno de: {list(COUNT_MODES)}")
+
+    if mode == "none":
+        return None
+    if mode == "estimate" and scope:
+        return counted_total(scope, statuses, day)
+    return db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+
+
+def page_count(total, per_page):
+    return (total + per_page - 1) // per_page if total is not None else None
+
+
+def rebuild_counters():
+    """Recalcula todos los contadores desde cero (backfill o corrección de deriva)."""
+    deltas = {}
+
+    for status, total in db.session.execute(select(Order.status, func.count()).group_by(Order.status)):
+        deltas[(ORDERS, status.name, "")] = total
+
+    day = func.date(Reservation.start_date_time)
+    for status, bucket, total in db.session.execute(
+            select(Reservation.status, day, func.count()).group_by(Reservation.status, day)):
+        deltas[(RESERVATIONS, status.name, str(bucket))] = total
+
+    db.session.execute(delete(StatusCounter))
+    apply_deltas(db.session.connection(), deltas)
+    db.session.commit()
+    return deltas
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import queue
+import select
+import threading
+import itertools
+from sqlalchemy import text
+from api.models import db
+
+# Pub/sub en proceso para empujar cambios (por ejemplo a la pantalla de cocina por SSE).
+# LocalBroker reparte los eventos entre los suscriptores de este worker; PostgresBroker
+# además los envía con NOTIFY y escucha con LISTEN para que todos los workers de
+# gunicorn reciban lo mismo.
+
+KITCHEN_CHANNEL = "kitchen_orders"
+
+# NOTIFY acepta payloads de hasta 8000 bytes
+NOTIFY_MAX_PAYLOAD = 7900
+
+
+class Subscription:
+    def __init__(self, broker, channel, maxsize=100):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Cliente lento: se descarta el evento más viejo, el cliente puede recargar la lista
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            self.queue.put_nowait(event)
+
+    def get(self, timeout=None):
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.broker.record_delivery(event)
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    backend = "local"
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.last_lag_ms = None
+        self.max_lag_ms = 0.0
+        self._total_lag_ms = 0.0
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.get(subscription.channel, set()).discard(subscription)
+
+    def publish(self, channel, event):
+        event.setdefault("ts", time.time())
+        self.dispatch(channel, event)
+
+    def dispatch(self, channel, event):
+        event = dict(event, seq=next(self._seq))
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        self.published += 1
+
+    def record_delivery(self, event):
+        lag_ms = (time.time() - event["ts"]) * 1000
+        with self._lock:
+            self.delivered += 1
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self._total_lag_ms += lag_ms
+
+    def stats(self):
+        with self._lock:
+            clients = sum(len(subs) for subs in self._subscribers.values())
+            dropped = sum(sub.dropped for subs in self._subscribers.values() for sub in subs)
+            return {
+                "backend": self.backend,
+                "clients": clients,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": dropped,
+                "last_lag_ms": round(self.last_lag_ms, 2) if self.last_lag_ms is not None else None,
+                "max_lag_ms": round(self.max_lag_ms, 2),
+                "avg_lag_ms": round(self._total_lag_ms / self.delivered, 2) if self.delivered else None
+            }
+
+
+class PostgresBroker(LocalBroker):
+    backend = "postgres"
+
+    def __init__(self, dsn):
+        super().__init__()
+        self.dsn = dsn
+        self._listeners = {}
+
+    def publish(self, channel, event):
+        event.setdefault("ts", time.time())
+        payload = json.dumps(event)
+        if len(payload.encode("utf-8")) > NOTIFY_MAX_PAYLOAD:
+            # Evento demasiado grande para NOTIFY: se manda solo la referencia
+            payload = json.dumps({k: event[k] for k in ("type", "id", "ids", "ts") if k in event})
+
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                               {"channel": channel, "payload": payload})
+            connection.commit()
+
+    def subscribe(self, channel):
+        with self._lock:
+            if channel not in self._listeners:
+                listener = threading.Thread(target=self._listen, args=(channel,), daemon=True)
+                self._listeners[channel] = listener
+                listener.start()
+        return super().subscribe(channel)
+
+    def _listen(self, channel):
+        import psycopg2
+        import psycopg2.extensions
+
+        backoff = 1
+        while True:
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{channel}"')
+                backoff = 1
+
+                while True:
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        self.dispatch(notify.channel, json.loads(notify.payload))
+            except Exception as e:
+                print("Error en LISTEN de eventos:", e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def create_broker():
+    backend = os.getenv("EVENTS_BACKEND", "").lower()
+    db_url = (os.getenv("DATABASE_URL") or "").replace("postgres://", "postgresql://")
+
+    if backend == "postgres" or (not backend and db_url.startswith("postgresql://")):
+        return PostgresBroker(db_url)
+    return LocalBroker()
+
+
+broker = create_broker()
+
+
+def publish_order_event(kind, order=None, order_id=None):
+    """Publica un cambio de orden para la cocina. Llamar después del commit."""
+    try:
+        broker.publish(KITCHEN_CHANNEL, {
+            "type": f"order.{kind}",
+            "id": order.id if order is not None else order_id,
+            "order": order.serialize() if order is not None else None
+        })
+    except Exception as e:
+        # Un fallo del pub/sub no debe deshacer una orden ya guardada
+        print("Error al publicar evento de cocina:", e)
+
+
+def publish_orders_event(kind, orders):
+    """Publica un único evento para un cambio masivo de órdenes."""
+    try:
+        broker.publish(KITCHEN_CHANNEL, {
+            "type": f"orders.{kind}",
+            "ids": [order.id for order in orders],
+            "orders": [order.serialize() for order in orders]
+        })
+    except Exception as e:
+        print("Error al publicar evento de cocina:", e)
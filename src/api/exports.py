@@ -0,0 +1,60 @@
+import io
+import csv
+from datetime import datetime, timedelta
+from flask import Response, current_app, stream_with_context
+
+# Respuestas de exportación en streaming (NDJSON o CSV).
+# Las filas se leen con yield_per (cursor del lado del servidor en PostgreSQL) y se
+# escriben a medida que llegan, así la memoria no crece con el rango exportado.
+
+EXPORT_FORMATS = ("ndjson", "csv")
+YIELD_PER = 1000
+
+
+def export_format(args):
+    fmt = args.get("format", "ndjson").lower().strip()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido. Usa uno de: {list(EXPORT_FORMATS)}")
+    return fmt
+
+
+def export_range(args):
+    """Rango opcional ?from=YYYY-MM-DD&to=YYYY-MM-DD como (inicio, fin exclusivo) en datetime."""
+    bounds = []
+    for name, extra in (("from", 0), ("to", 1)):
+        value = args.get(name, "").strip()
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(datetime.strptime(value, "%Y-%m-%d") + timedelta(days=extra))
+        except ValueError:
+            raise ValueError(f"Formato de fecha inválido en '{name}'. Usa YYYY-MM-DD")
+    return tuple(bounds)
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def stream_export(name, fmt, records, header=None, csv_rows=None):
+    """
+    `records` es un iterable de objetos con serialize(); para CSV, `csv_rows(record)`
+    devuelve las filas (listas) de cada registro bajo `header`.
+    """
+    def generate():
+        if fmt == "csv":
+            yield _csv_line(header)
+            for record in records:
+                for row in csv_rows(record):
+                    yield _csv_line(row)
+        else:
+            for record in records:
+                yield current_app.json.dumps(record.serialize()) + "\n"
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename={name}.{fmt}"
+    })
@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.exc import IntegrityError
+from api.models import db, IdempotencyKey
+
+# Soporte para el header Idempotency-Key en los POST que crean órdenes y reservas.
+# La primera petición reserva la clave; los reintentos con la misma clave reciben la
+# respuesta guardada sin volver a tocar las tablas ni enviar correos.
+# El hash de la petición incluye a quien la hace (identity del JWT, o la IP si no hay token):
+# otro usuario que repita la misma clave y el mismo body recibe 422, no la respuesta ajena.
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24)))
+# Segundos que espera un duplicado concurrente a que termine la petición original
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+
+
+def _caller():
+    verify_jwt_in_request(optional=True)
+    identity = get_jwt_identity()
+    return f"user:{identity}" if identity is not None else f"ip:{request.remote_addr}"
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(_caller().encode())
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _claim(endpoint, key, request_hash):
+    """Intenta reservar la clave. Devuelve None si se reservó o la fila existente."""
+    now = datetime.now()
+    db.session.add(IdempotencyKey(
+        endpoint=endpoint, key=key, request_hash=request_hash,
+        created_at=now, expires_at=now + IDEMPOTENCY_TTL
+    ))
+    try:
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = db.session.get(IdempotencyKey, (endpoint, key))
+    if existing is not None and existing.expires_at <= now:
+        # Clave vencida que aún no se purgó: se libera y se vuelve a reservar
+        db.session.delete(existing)
+        db.session.commit()
+        return _claim(endpoint, key, request_hash)
+    return existing
+
+
+def _wait_for_completion(endpoint, key):
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        db.session.expire_all()
+        existing = db.session.get(IdempotencyKey, (endpoint, key))
+        if existing is None or existing.status_code is not None:
+            return existing
+    return None
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(endpoint):
+    """Decorador para POST: aplica Idempotency-Key si el cliente lo envía."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get("Idempotency-Key", "").strip()
+            if request.method != "POST" or not key:
+                return view(*args, **kwargs)
+
+            if len(key) > 255:
+                return jsonify({"error": "Idempotency-Key demasiado larga"}), 400
+
+            request_hash = _request_hash()
+            existing = _claim(endpoint, key, request_hash)
+
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return jsonify({"error": "Idempotency-Key ya usada con otra solicitud"}), 422
+                if existing.status_code is None:
+                    # Duplicado concurrente: se espera a la petición original en vez de competir
+                    existing = _wait_for_completion(endpoint, key)
+                    if existing is None or existing.status_code is None:
+                        return jsonify({"error": "La solicitud original sigue en proceso"}), 409
+                return _replay(existing)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                _release(endpoint, key)
+                raise
+
+            if response.status_code >= 500:
+                # Un error del servidor no se guarda: el cliente puede reintentar
+                _release(endpoint, key)
+                return response
+
+            record = db.session.get(IdempotencyKey, (endpoint, key))
+            record.status_code = response.status_code
+            record.response_body = response.get_data(as_text=True)
+            db.session.commit()
+            return response
+
+        return wrapper
+    return decorator
+
+
+def _release(endpoint, key):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.endpoint == endpoint, IdempotencyKey.key == key))
+    db.session.commit()
+
+
+def purge_expired_keys(batch_size=1000):
+    """Borra claves vencidas en lotes para no bloquear la tabla. Devuelve cuántas borró."""
+    purged = 0
+    while True:
+        batch = db.session.execute(
+            select(IdempotencyKey.endpoint, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= datetime.now())
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return purged
+
+        db.session.execute(delete(IdempotencyKey).where(
+            tuple_(IdempotencyKey.endpoint, IdempotencyKey.key).in_([tuple(row) for row in batch])))
+        db.session.commit()
+        purged += len(batch)
@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from flask import jsonify, g
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+from api.models import db, User
+
+# Identidad de los requests autenticados.
+# El token lleva el id del usuario como identity y los claims role, email y ver
+# (User.token_version, que sube cuando cambian el rol o la contraseña).
+# Los datos del usuario se leen de un cache LRU con TTL por proceso: edit_user,
+# update_profile, delete_user y verify-email lo invalidan en este worker y el TTL acota
+# cuánto puede durar una copia vieja en los demás.
+# Los tokens viejos con el email como identity se siguen aceptando hasta que venzan.
+# Los tokens de verificación de email llevan el claim purpose y no abren sesión: el
+# token_verification_loader de la app (token_allowed) los rechaza fuera de /verify-email
+# y /verify-email no acepta otros.
+
+VERIFY_EMAIL = "verify_email"
+
+
+class CachedUser:
+    __slots__ = ("id", "email", "name", "last_name", "phone_number", "role", "is_active", "token_version")
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+        self.last_name = user.last_name
+        self.phone_number = user.phone_number
+        self.role = user.role
+        self.is_active = user.is_active
+        self.token_version = user.token_version
+
+
+class UserCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._emails = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        return self._store(CachedUser(user), now)
+
+    def get_by_email(self, email):
+        """Solo para tokens viejos que llevan el email como identity."""
+        with self._lock:
+            user_id = self._emails.get(email)
+        if user_id is not None:
+            cached = self.get(user_id)
+            if cached is not None and cached.email == email:
+                return cached
+
+        user_id = db.session.scalar(select(User.id).where(User.email == email))
+        return self.get(user_id) if user_id is not None else None
+
+    def _store(self, cached, now):
+        with self._lock:
+            self._entries[cached.id] = (now + self.ttl, cached)
+            self._entries.move_to_end(cached.id)
+            self._emails[cached.email] = cached.id
+            while len(self._entries) > self.maxsize:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._emails.pop(evicted.email, None)
+                self.evictions += 1
+        return cached
+
+    def invalidate(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._emails.pop(entry[1].email, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+user_cache = UserCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 1024)),
+    ttl=int(os.getenv("USER_CACHE_TTL", 60))
+)
+
+
+def issue_token(user, **kwargs):
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={"role": user.role.value, "email": user.email, "ver": user.token_version},
+        **kwargs
+    )
+
+
+def issue_verification_token(user_id):
+    return create_access_token(
+        identity=str(user_id),
+        additional_claims={"user_id": user_id, "purpose": VERIFY_EMAIL},
+        expires_delta=timedelta(hours=24)
+    )
+
+
+def token_purpose(payload):
+    """None para un token de sesión; VERIFY_EMAIL para uno de verificación."""
+    if "purpose" in payload:
+        return payload["purpose"]
+    # Emitidos antes del claim purpose: el id como identity y sin ver (issue_token siempre lo pone)
+    if str(payload.get("sub")).isdigit() and "ver" not in payload:
+        return VERIFY_EMAIL
+    return None
+
+
+def token_allowed(payload):
+    """Cada ruta acepta solo tokens de su propósito: de sesión salvo con verification_token_required."""
+    return token_purpose(payload) == g.get("token_purpose")
+
+
+def verification_token_required(view):
+    """Como @jwt_required(), pero exige un token de verificación de email."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.token_purpose = VERIFY_EMAIL
+        verify_jwt_in_request()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _session_identity():
+    # token_allowed ya filtra los tokens de verificación; esto cubre cualquier ruta sin ese chequeo
+    if token_purpose(get_jwt()) is not None:
+        return None
+    return get_jwt_identity()
+
+
+def current_user():
+    """CachedUser del token del request (o None si el usuario ya no existe)."""
+    identity = _session_identity()
+    if identity is None:
+        return None
+    if str(identity).isdigit():
+        return user_cache.get(int(identity))
+    return user_cache.get_by_email(identity)
+
+
+def current_user_id():
+    identity = _session_identity()
+    if identity is None:
+        return None
+    if str(identity).isdigit():
+        return int(identity)
+    user = user_cache.get_by_email(identity)
+    return user.id if user else None
+
+
+def current_role():
+    """
+    Rol del usuario del token. Si el token es de la versión actual del usuario se usa el claim;
+    si no (o es un token viejo sin ver) se usa el rol guardado.
+    """
+    claims = get_jwt()
+    user = current_user()
+    if user is None:
+        return None
+    if claims.get("ver") == user.token_version and claims.get("role"):
+        return claims["role"]
+    return user.role.value
+
+
+def role_required(*roles):
+    """Como @jwt_required(), y además exige uno de `roles` (valores de user_role)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            if current_role() not in roles:
+                return jsonify({"msg": "No tienes permisos para esta acción"}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,55 @@
+import os
+import time
+import hashlib
+import threading
+from flask import request, current_app, Response
+
+# Cache del menú (platos y bebidas) por worker.
+# Cada ruta que escribe en Dishes/Drinks llama a menu_cache.invalidate(),
+# lo que sube la versión y descarta las respuestas ya serializadas.
+# El TTL acota cuánto tiempo puede ver otro worker de gunicorn un menú viejo.
+
+
+class MenuCache:
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self.version = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def get(self, key, loader):
+        """Devuelve (body, etag) para `key`, serializando con `loader` si no está en cache."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and entry[0] == self.version and entry[1] > now:
+            return entry[2], entry[3]
+
+        version = self.version
+        body = current_app.json.dumps(loader()).encode("utf-8")
+        # ETag fuerte basado en el contenido: dos workers con el mismo menú dan el mismo ETag
+        etag = hashlib.sha1(body).hexdigest()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = (version, now + self.ttl, body, etag)
+        return body, etag
+
+    def response(self, key, loader):
+        body, etag = self.get(key, loader)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, status=200, mimetype="application/json")
+
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+
+menu_cache = MenuCache(ttl=int(os.getenv("MENU_CACHE_TTL", 30)))
@@ -1,9 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, Enum, DateTime, Integer, ForeignKey, Text
+from sqlalchemy import String, Boolean, Enum, DateTime, Date, Integer, BigInteger, Float, ForeignKey, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from enum import Enum as PyEnum
 from sqlalchemy.sql import func
-from datetime import datetime
+from datetime import datetime, date
 
 db = SQLAlchemy()
 
@@ -17,6 +17,9 @@ class user_role(PyEnum):
 
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        db.Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
@@ -28,10 +31,14 @@ class User(db.Model):
     role: Mapped[user_role] = mapped_column(
         Enum(user_role, name="user_role_enum", native_enum=False), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
+    # Sube cuando cambian el rol o la contraseña; va en el claim "ver" del token (ver api/identity.py)
+    token_version: Mapped[int] = mapped_column(Integer(), nullable=False, default=0, server_default="0")
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(), default=func.now(), server_default=func.now(), nullable=False)
     updated_at: Mapped[DateTime] = mapped_column(DateTime(), default=func.now(
     ), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Nombre, apellido y email normalizados para el buscador (ver api/search.py)
+    search_key: Mapped[str] = mapped_column(String(400), nullable=False, default="", server_default="")
 
     def serialize(self):
         return {
@@ -133,6 +140,11 @@ class reservation_status(PyEnum):
 
 class Reservation(db.Model):
     __tablename__ = "reservations"
+    __table_args__ = (
+        db.Index("ix_reservations_start_date_time_id", "start_date_time", "id"),
+        db.Index("ix_reservations_start_date_time_status", "start_date_time", "status"),
+        db.Index("ix_reservations_table_id", "table_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
@@ -143,11 +155,15 @@ class Reservation(db.Model):
     table_id: Mapped[int] = mapped_column(
         ForeignKey("tables.id"), nullable=True)
     status: Mapped[reservation_status] = mapped_column(Enum(
-        reservation_status, native_enum=False), default=reservation_status.PENDIENTE)
-    start_date_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+        reservation_status, native_enum=False), default=reservation_status.PENDIENTE, active_history=True)
+    start_date_time: Mapped[datetime] = mapped_column(DateTime, nullable=False, active_history=True)
+    # start_date_time + RESERVATION_DURATION_MINUTES al guardar (ver api/availability.py)
+    end_date_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     additional_details: Mapped[str] = mapped_column(Text, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(), default=func.now(), server_default=func.now(), nullable=False)
+    # Nombre y email normalizados para el buscador (ver api/search.py)
+    search_key: Mapped[str] = mapped_column(String(400), nullable=False, default="", server_default="")
 
     # Relaciones opcionales
     # user = relationship("User", backref="reservations")
@@ -203,13 +219,16 @@ class order_status(PyEnum):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    __table_args__ = (
+        db.Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     order_code: Mapped[str] = mapped_column(
         String(20), unique=True, nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
     status: Mapped[order_status] = mapped_column(
-        Enum(order_status, native_enum=False), default=order_status.EN_PROCESO)
+        Enum(order_status, native_enum=False), default=order_status.EN_PROCESO, active_history=True)
     total: Mapped[float] = mapped_column(nullable=False)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(), default=func.now(), server_default=func.now(), nullable=False)
@@ -251,3 +270,165 @@ class OrderDetail(db.Model):
             "precio": self.unit_price,
             "subtotal": round(self.unit_price * self.quantity, 2)
         }
+
+
+# Contadores por estado mantenidos en la misma transacción que las escrituras
+# (ver api/counters.py). scope es "orders" o "reservations"; bucket es el día
+# (YYYY-MM-DD) para reservas y vacío para órdenes.
+class StatusCounter(db.Model):
+    __tablename__ = "status_counters"
+
+    scope: Mapped[str] = mapped_column(String(20), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    bucket: Mapped[str] = mapped_column(String(10), primary_key=True, default="")
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# Claves de idempotencia para POST /orders y POST /reservations (ver api/idempotency.py)
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    endpoint: Mapped[str] = mapped_column(String(50), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, index=True)
+
+
+class email_status(PyEnum):
+    PENDIENTE = "PENDIENTE"
+    ENVIANDO = "ENVIANDO"
+    ENVIADO = "ENVIADO"
+    FALLIDO = "FALLIDO"
+
+
+# Correos pendientes de envío; los entrega `flask email-worker` (ver api/outbox.py).
+# FALLIDO es la cola de mensajes muertos: se agotaron los reintentos.
+class EmailOutbox(db.Model):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    to_email: Mapped[str] = mapped_column(String(120), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    is_html: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
+    status: Mapped[email_status] = mapped_column(
+        Enum(email_status, native_enum=False), nullable=False, default=email_status.PENDIENTE)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
+    locked_until: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(), default=func.now(), server_default=func.now(), nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "to_email": self.to_email,
+            "subject": self.subject,
+            "status": self.status.value,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "sent_at": self.sent_at.isoformat() if self.sent_at else None,
+        }
+
+
+# Avisos al admin acumulados para el resumen periódico (ver api/admin_digest.py)
+class AdminNotification(db.Model):
+    __tablename__ = "admin_notifications"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    category: Mapped[str] = mapped_column(String(30), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
+    digest_sent_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True, index=True)
+
+
+# Token buckets compartidos entre workers para limitar intentos (ver api/rate_limit.py).
+# updated_at es un timestamp Unix en segundos.
+class RateLimitBucket(db.Model):
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+# Tokens revocados (ver api/revocation.py). Con jti se revoca un token; con solo user_id,
+# todos los tokens del usuario emitidos antes de created_at. La fila se puede borrar desde
+# expires_at, cuando los tokens que revoca ya vencieron.
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    jti: Mapped[str] = mapped_column(String(36), nullable=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, index=True)
+
+
+# Secuencias con nombre reservadas por bloques (ver api/order_codes.py)
+class SequenceBlock(db.Model):
+    __tablename__ = "sequence_blocks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# Registro de las tablas mensuales de archivo de órdenes (ver api/archive.py)
+class OrderArchive(db.Model):
+    __tablename__ = "order_archives"
+
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)
+    orders_table: Mapped[str] = mapped_column(String(63), nullable=False)
+    details_table: Mapped[str] = mapped_column(String(63), nullable=False)
+    partitioned: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(), default=func.now(), server_default=func.now(), nullable=False)
+
+
+# Resumen diario de ventas por producto, mantenido de forma incremental (ver api/sales.py).
+# product_name vacío guarda el total del día, con el número de órdenes distintas.
+class SalesDaily(db.Model):
+    __tablename__ = "sales_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_name: Mapped[str] = mapped_column(String(120), primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# Marca de agua de los procesos incrementales (hasta dónde se procesó)
+class JobWatermark(db.Model):
+    __tablename__ = "job_watermarks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
+
+
+# Pares de mesas que se pueden juntar para grupos grandes (lista de adyacencia, table_id < adjacent_id)
+class TableLink(db.Model):
+    __tablename__ = "table_links"
+
+    table_id: Mapped[int] = mapped_column(ForeignKey("tables.id", ondelete="CASCADE"), primary_key=True)
+    adjacent_id: Mapped[int] = mapped_column(ForeignKey("tables.id", ondelete="CASCADE"), primary_key=True)
+
+
+# Mesas adicionales de una reserva con mesas combinadas; Reservation.table_id guarda la principal
+class ReservationExtraTable(db.Model):
+    __tablename__ = "reservation_extra_tables"
+
+    reservation_id: Mapped[int] = mapped_column(
+        ForeignKey("reservations.id", ondelete="CASCADE"), primary_key=True)
+    table_id: Mapped[int] = mapped_column(
+        ForeignKey("tables.id", ondelete="CASCADE"), primary_key=True, index=True)
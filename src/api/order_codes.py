@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from datetime import date
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from api.models import db, SequenceBlock
+
+# Generadores de Order.order_code sin consultar el máximo en cada orden.
+#
+# - BlockSequenceGenerator: prefijo por día + secuencia. Cada worker reserva un bloque
+#   de números en sequence_blocks (un UPDATE por bloque) y los reparte en memoria,
+#   por ejemplo 261018-00042.
+# - SnowflakeGenerator: timestamp + id de worker + contador, sin base de datos por código.
+#   Se usa como respaldo si no se puede reservar un bloque. El id de worker (0-1023) sale de
+#   WORKER_ID si está definido (debe ser único por proceso) o se reserva en sequence_blocks
+#   una vez por proceso; nunca del pid, que se repite entre contenedores.
+#
+# ORDER_CODE_STRATEGY=block|snowflake elige el generador principal.
+
+BASE36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _increment(name, step):
+    """Suma `step` a la secuencia `name` en su propia transacción y devuelve el valor nuevo."""
+    table = SequenceBlock.__table__
+    with db.engine.begin() as connection:
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            upsert = pg_insert if dialect == "postgresql" else sqlite_insert
+            stmt = upsert(table).values(name=name, value=step)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.name],
+                set_={"value": table.c.value + step}
+            ).returning(table.c.value)
+            return connection.execute(stmt).scalar_one()
+
+        result = connection.execute(
+            update(table).where(table.c.name == name).values(value=table.c.value + step))
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, value=step))
+        return connection.execute(select(table.c.value).where(table.c.name == name)).scalar_one()
+
+
+def _base36(number):
+    digits = ""
+    while number:
+        number, rest = divmod(number, 36)
+        digits = BASE36[rest] + digits
+    return digits or "0"
+
+
+class SnowflakeGenerator:
+    # 2025-01-01 en milisegundos
+    EPOCH_MS = 1735689600000
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+
+    def __init__(self, worker_id=None):
+        if worker_id is None and os.getenv("WORKER_ID"):
+            worker_id = int(os.getenv("WORKER_ID"))
+        if worker_id is not None and not 0 <= worker_id < (1 << self.WORKER_BITS):
+            raise ValueError(f"WORKER_ID debe estar entre 0 y {(1 << self.WORKER_BITS) - 1}")
+        self._configured_id = worker_id
+        self._worker_id = worker_id
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _ensure_worker_id(self):
+        # Sin WORKER_ID, cada proceso (también los hijos de un fork) reserva su propio id
+        if self._configured_id is None and (self._worker_id is None or self._pid != os.getpid()):
+            self._worker_id = (_increment("snowflake_worker", 1) - 1) % (1 << self.WORKER_BITS)
+            self._pid = os.getpid()
+            self._last_ms = -1
+            self._sequence = 0
+        return self._worker_id
+
+    def reserve_worker_id(self):
+        """Reserva el id de worker por adelantado, mientras la base responde."""
+        with self._lock:
+            return self._ensure_worker_id()
+
+    def next_id(self):
+        with self._lock:
+            worker_id = self._ensure_worker_id()
+            now_ms = int(time.time() * 1000)
+            if now_ms < self._last_ms:
+                # Reloj hacia atrás: se sigue con el último instante conocido
+                now_ms = self._last_ms
+
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) % (1 << self.SEQUENCE_BITS)
+                if self._sequence == 0:
+                    while now_ms <= self._last_ms:
+                        now_ms = int(time.time() * 1000)
+            else:
+                self._sequence = 0
+
+            self._last_ms = now_ms
+            return ((now_ms - self.EPOCH_MS) << (self.WORKER_BITS + self.SEQUENCE_BITS)) \
+                | (worker_id << self.SEQUENCE_BITS) | self._sequence
+
+    def next_code(self):
+        return "S" + _base36(self.next_id())
+
+
+class BlockSequenceGenerator:
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._name = None
+        self._pid = None
+        self._next = 0
+        self._end = -1
+
+    def _allocate(self, name):
+        """Reserva el siguiente bloque de `name` y devuelve su último número."""
+        return _increment(name, self.block_size)
+
+    def next_code(self):
+        prefix = date.today().strftime("%y%m%d")
+        name = f"order_code:{prefix}"
+
+        with self._lock:
+            # Un bloque heredado por fork (gunicorn --preload) no se puede compartir entre workers
+            if name != self._name or self._pid != os.getpid() or self._next > self._end:
+                self._end = self._allocate(name)
+                self._next = self._end - self.block_size + 1
+                self._name = name
+                self._pid = os.getpid()
+
+            number = self._next
+            self._next += 1
+
+        return f"{prefix}-{number:05d}"
+
+
+class OrderCodeGenerator:
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def next_code(self):
+        try:
+            code = self.primary.next_code()
+        except Exception as e:
+            print("Error al generar order_code, usando respaldo:", e)
+            return self.fallback.next_code()
+
+        try:
+            # El respaldo reserva su id mientras la base funciona, para tenerlo si deja de hacerlo
+            self.fallback.reserve_worker_id()
+        except Exception as e:
+            print("Error al reservar el id de worker del respaldo:", e)
+        return code
+
+
+def create_order_code_generator():
+    snowflake = SnowflakeGenerator()
+    if os.getenv("ORDER_CODE_STRATEGY", "block").lower() == "snowflake":
+        return snowflake
+    block_size = int(os.getenv("ORDER_CODE_BLOCK_SIZE", 100))
+    return OrderCodeGenerator(BlockSequenceGenerator(block_size), snowflake)
+
+
+order_codes = create_order_code_generator()
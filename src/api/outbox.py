@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, update, func, or_, and_
+from api.models import db, EmailOutbox, email_status
+from api.utils import send_email, send_many, SMTP_TIMEOUT
+
+# Outbox de correos (EMAIL_DELIVERY=outbox): los requests solo insertan una fila en
+# email_outbox y un proceso aparte (`flask email-worker`, proceso worker del Procfile) la
+# envía con un pool de hilos.
+# - Cada hilo reclama un lote (PENDIENTE con next_attempt_at vencido, o ENVIANDO con el
+#   lease vencido si un worker murió a mitad de envío) con un UPDATE condicional.
+# - Si el envío falla se reintenta con backoff exponencial; al agotar EMAIL_MAX_ATTEMPTS
+#   el correo queda FALLIDO (cola de mensajes muertos) con el último error.
+# Por defecto (EMAIL_DELIVERY=direct) se envía dentro del request: la outbox solo se activa
+# donde corre el worker, si no los correos quedarían pendientes para siempre.
+
+DELIVERY_MODE = os.getenv("EMAIL_DELIVERY", "direct").lower()
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+RETRY_BASE = timedelta(seconds=int(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30)))
+RETRY_MAX = timedelta(hours=6)
+LEASE_MARGIN = timedelta(minutes=1)
+
+
+def lease_for(batch_size):
+    """Reserva de un lote: más que su peor caso, un timeout al conectar y otro al enviar por correo."""
+    return timedelta(seconds=batch_size * 2 * SMTP_TIMEOUT) + LEASE_MARGIN
+
+
+def queue_email(to_email, subject, body, is_html=False):
+    """Encola un correo y hace commit. Devuelve True si quedó encolado (o enviado en modo direct)."""
+    if DELIVERY_MODE == "direct":
+        return send_email(to_email, subject, body, is_html)
+
+    try:
+        db.session.add(EmailOutbox(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            is_html=is_html,
+            status=email_status.PENDIENTE,
+            next_attempt_at=datetime.now()
+        ))
+        db.session.commit()
+        return True
+
+    except Exception as e:
+        db.session.rollback()
+        print("❌ Error al encolar correo:", e)
+        return False
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * (2 ** max(attempts - 1, 0)), RETRY_MAX)
+
+
+def claim_batch(batch_size):
+    """Reserva hasta `batch_size` correos para este worker y devuelve sus ids."""
+    now = datetime.now()
+    due = or_(
+        and_(EmailOutbox.status == email_status.PENDIENTE, EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == email_status.ENVIANDO, EmailOutbox.locked_until < now)
+    )
+
+    ids = db.session.scalars(
+        select(EmailOutbox.id).where(due)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.session.rollback()
+        return []
+
+    # La condición se repite en el UPDATE: en SQLite dos workers pueden haber leído los mismos ids
+    claimed = db.session.scalars(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), due)
+        .values(status=email_status.ENVIANDO, locked_until=now + lease_for(batch_size), attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return claimed
+
+
+def _record_result(email, error):
+    if error is None:
+        email.status = email_status.ENVIADO
+        email.sent_at = datetime.now()
+        email.last_error = None
+    elif email.attempts >= MAX_ATTEMPTS:
+        email.status = email_status.FALLIDO
+        email.last_error = error
+    else:
+        email.status = email_status.PENDIENTE
+        email.next_attempt_at = datetime.now() + retry_delay(email.attempts)
+        email.last_error = error
+    email.locked_until = None
+
+
+def deliver_batch(batch_size=20):
+    """Reclama y envía un lote por conexiones SMTP reutilizadas. Devuelve (enviados, fallidos)."""
+    ids = claim_batch(batch_size)
+    if not ids:
+        return 0, 0
+
+    emails = db.session.scalars(select(EmailOutbox).where(EmailOutbox.id.in_(ids)).order_by(EmailOutbox.id)).all()
+
+    def on_result(index, error):
+        _record_result(emails[index], None if error is None else f"{type(error).__name__}: {error}")
+        # Commit por correo: si el proceso muere, los ya enviados no se reenvían
+        db.session.commit()
+
+    results = send_many([(e.to_email, e.subject, e.body, e.is_html) for e in emails], on_result)
+    failed = sum(1 for error in results if error is not None)
+    return len(results) - failed, failed
+
+
+def outbox_stats():
+    return {
+        status.value: count
+        for status, count in db.session.execute(
+            select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status))
+    }
+
+
+def run_email_worker(app, threads=4, batch_size=20, poll_interval=2.0, once=False):
+    """Corre `threads` hilos que vacían la outbox; con `once` termina cuando no queda nada por enviar."""
+    stop = threading.Event()
+    totals = {"sent": 0, "failed": 0}
+    lock = threading.Lock()
+
+    from api.admin_digest import flush_digest
+
+    def loop():
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    sent, failed = deliver_batch(batch_size)
+                except Exception:
+                    db.session.rollback()
+                    traceback.print_exc()
+                    sent = failed = 0
+
+                with lock:
+                    totals["sent"] += sent
+                    totals["failed"] += failed
+
+                if sent == 0 and failed == 0:
+                    if once:
+                        return
+                    try:
+                        # El resumen del admin también sale por tiempo, aunque no lleguen avisos nuevos
+                        flush_digest()
+                    except Exception:
+                        db.session.rollback()
+                        traceback.print_exc()
+                    stop.wait(poll_interval)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(loop) for _ in range(threads)]
+        try:
+            while not all(future.done() for future in futures):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+
+    return totals
@@ -0,0 +1,81 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_, func
+from api.models import db
+
+# Paginación por cursor (keyset) para listados grandes.
+# En lugar de OFFSET, se busca a partir de la última fila vista usando (columna, id),
+# así la página 5000 cuesta lo mismo que la página 1 si hay un índice sobre esas columnas.
+
+
+def encode_cursor(value, id, direction="next"):
+    raw = json.dumps([value.isoformat(), id, direction])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        value, id, direction = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return datetime.fromisoformat(value), int(id), direction
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def _sort_value(column):
+    """
+    Expresión por la que se ordena y se compara `column`.
+    SQLite guarda los DateTime como texto y no siempre igual: func.now() deja
+    'YYYY-MM-DD HH:MM:SS' y SQLAlchemy enlaza 'YYYY-MM-DD HH:MM:SS.000000', que como texto
+    es mayor, así que el cursor volvía a devolver su propia fila. julianday() compara
+    los dos formatos por su valor.
+    """
+    if db.session.get_bind().dialect.name == "sqlite":
+        return func.julianday(column)
+    return column
+
+
+def _fetch_scalars(stmt, order_by, limit):
+    return db.session.scalars(stmt.order_by(*order_by).limit(limit)).unique().all()
+
+
+def keyset_page(stmt, column, id_column, cursor, per_page, descending=True, fetch=_fetch_scalars):
+    """
+    Devuelve (items, next_cursor, prev_cursor) ordenando por (column, id_column).
+    Un cursor vacío pide la primera página. `fetch(stmt, order_by, limit)` permite
+    cargar las filas con otro modelo de lectura (ver api/read_models.py).
+    """
+    key = (_sort_value(column), id_column)
+    direction = "next"
+    if cursor:
+        value, last_id, direction = decode_cursor(cursor)
+
+    # Al retroceder se recorre el índice en sentido contrario y luego se invierte la página
+    scan_desc = descending if direction == "next" else not descending
+
+    if cursor:
+        if scan_desc:
+            stmt = stmt.where(tuple_(*key) < tuple_(_sort_value(value), last_id))
+        else:
+            stmt = stmt.where(tuple_(*key) > tuple_(_sort_value(value), last_id))
+
+    order_by = [col.desc() if scan_desc else col.asc() for col in key]
+    rows = fetch(stmt, order_by, limit=per_page + 1)
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if direction == "prev":
+        items.reverse()
+
+    next_cursor = None
+    prev_cursor = None
+    if items:
+        first, last = items[0], items[-1]
+        if direction == "prev" or has_more:
+            next_cursor = encode_cursor(getattr(last, column.key), getattr(last, id_column.key), "next")
+        if (direction == "next" and cursor) or (direction == "prev" and has_more):
+            prev_cursor = encode_cursor(getattr(first, column.key), getattr(first, id_column.key), "prev")
+
+    return items, next_cursor, prev_cursor
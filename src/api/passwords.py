@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+
+# Hash de contraseñas fuera del hilo del request.
+# bcrypt ocupa la CPU ~250 ms por llamada; en un ProcessPoolExecutor acotado no bloquea el GIL
+# del worker de gunicorn y una ráfaga de logins no deja sin CPU al resto de los requests.
+# - BCRYPT_LOG_ROUNDS: costo de los hashes nuevos. Los hashes con otro costo se recalculan
+#   en el siguiente login correcto (verify_and_update).
+# - PASSWORD_HASH_WORKERS: procesos del pool (0 = hash en el mismo hilo).
+# - PASSWORD_HASH_MAX_PENDING: hashes en cola o en curso; por encima se rechaza con
+#   PasswordHasherBusy en lugar de acumular requests esperando. Un hash que no termina en
+#   `timeout` segundos también se informa como PasswordHasherBusy (503 con Retry-After).
+# Los hashes son compatibles con los de flask_bcrypt ($2b$).
+
+
+class PasswordHasherBusy(Exception):
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Hash corrupto o con otro formato
+        return False
+
+
+class PasswordHasher:
+    def __init__(self, rounds=12, workers=2, max_pending=32, timeout=10):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+        self._rehashed = 0
+        self._latencies = deque(maxlen=500)
+
+    def _get_executor(self):
+        # Un pool heredado por fork (gunicorn --preload) no sirve en el proceso hijo
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy("Demasiadas solicitudes, intenta nuevamente en unos segundos")
+            self._pending += 1
+
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            with self._lock:
+                executor = self._get_executor()
+            return executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy("El servidor está ocupado, intenta nuevamente en unos segundos")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._latencies.append(time.perf_counter() - started)
+
+    def hash(self, password):
+        return self._run(_hash, password.encode("utf-8"), self.rounds)
+
+    def verify(self, password, hashed):
+        if not password or not hashed:
+            return False
+        return self._run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed):
+        # $2b$12$... -> costo 12
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def verify_and_update(self, user, password):
+        """Verifica la contraseña del usuario y, si es correcta y el costo cambió, guarda un hash nuevo (sin commit)."""
+        if not self.verify(password, user.password):
+            return False
+        if self.needs_rehash(user.password):
+            user.password = self.hash(password)
+            with self._lock:
+                self._rehashed += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            pending = self._pending
+            counts = (self._completed, self._rejected, self._rehashed)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1)
+
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queue_depth": pending,
+            "completed": counts[0],
+            "rejected": counts[1],
+            "rehashed": counts[2],
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv("BCRYPT_LOG_ROUNDS", 12)),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+)
@@ -0,0 +1,106 @@
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Instrumentación de SQL por request.
+# Cuenta las sentencias y el tiempo en la base de cada request y los devuelve en los headers
+# X-DB-Queries y Server-Timing (visibles en la pestaña Network del navegador).
+# Si la misma sentencia se repite SQL_N_PLUS_ONE_THRESHOLD veces o más en un request
+# (típico de un lazy load dentro de un loop: order.user, detail.serialize(), ...), se
+# registra como probable N+1 con la sentencia y el endpoint.
+# SQL_INSTRUMENTATION=0 la desactiva.
+
+ENABLED = os.getenv("SQL_INSTRUMENTATION", "1") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+_budgets = []
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold):
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+
+    if has_request_context() and "query_stats" in g:
+        g.query_stats.record(statement, elapsed)
+    for stats in _budgets:
+        stats.record(statement, elapsed)
+
+
+def _handle_error(context):
+    # Una sentencia que falla no llega a after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+@contextmanager
+def query_budget(max_queries):
+    """
+    Falla con AssertionError si el bloque ejecuta más de `max_queries` sentencias.
+    Pensado para pruebas: with query_budget(3): client.get("/api/orders")
+    """
+    stats = QueryStats()
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+
+    if stats.count > max_queries:
+        repeated = "".join(f"\n  {n}x {statement[:200]}" for statement, n in stats.repeated(2))
+        raise AssertionError(f"{stats.count} sentencias SQL, el máximo es {max_queries}{repeated}")
+
+
+def setup_query_stats(app):
+    if not ENABLED:
+        return
+
+    # Sobre la clase Engine: cubre el engine de la app y los que cree Flask-SQLAlchemy después
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def add_query_headers(response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers.add(
+            "Server-Timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+
+        for statement, n in stats.repeated(N_PLUS_ONE_THRESHOLD):
+            app.logger.warning(
+                "Probable N+1 en %s %s: %d veces %s", request.method, request.path, n, statement[:300])
+
+        return response
@@ -0,0 +1,146 @@
+import os
+import math
+import time
+import heapq
+import threading
+from functools import wraps
+from flask import request, jsonify
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from api.models import db, RateLimitBucket
+
+# Límite de intentos de login con token buckets por IP y por email.
+# El chequeo corre antes de leer la base o llamar a bcrypt, así una ráfaga de credential
+# stuffing recibe 429 sin consumir CPU.
+# - LocalStore: buckets en memoria del proceso.
+# - DatabaseStore (RATE_LIMIT_BACKEND=database): buckets compartidos entre workers en
+#   rate_limit_buckets, actualizados con un solo upsert atómico. El bucket local se
+#   consulta primero: si un proceso solo ya superó el límite, no hace falta ir a la base.
+# Límites como "intentos/segundos": LOGIN_RATE_LIMIT_IP=20/60, LOGIN_RATE_LIMIT_EMAIL=5/300.
+
+
+def parse_rate(value):
+    """'20/60' -> (capacidad 20, 20/60 tokens por segundo)."""
+    tokens, seconds = value.split("/")
+    capacity = float(tokens)
+    return capacity, capacity / float(seconds)
+
+
+class LocalStore:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        # Heap de (momento en que el bucket vuelve a estar lleno, key), una entrada por take;
+        # las entradas de un bucket que se actualizó después se descartan al salir
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Consume un token. Devuelve 0 si se permitió o los segundos hasta el próximo token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, None))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Se guarda cuándo el bucket vuelve a estar lleno, para poder descartarlo
+            full_at = now + (capacity - tokens) / rate
+            self._buckets[key] = (tokens, now, full_at)
+            heapq.heappush(self._expiry, (full_at, key))
+            self._prune(now)
+
+        return 0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, now):
+        # Un bucket que ya se habría llenado otra vez equivale a no tener entrada. Por encima de
+        # max_keys se descarta además el más cercano a llenarse, el que menos historia pierde.
+        # Cada entrada sale del heap una sola vez: O(log n) amortizado por take.
+        expiry = self._expiry
+        while expiry and (expiry[0][0] <= now or len(self._buckets) > self.max_keys):
+            full_at, key = heapq.heappop(expiry)
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket[2] == full_at:
+                del self._buckets[key]
+
+        if len(expiry) > 2 * max(len(self._buckets), self.max_keys):
+            # Demasiadas entradas viejas de buckets muy usados: se rehace el heap
+            self._expiry = [(full_at, key) for key, (_, _, full_at) in self._buckets.items()]
+            heapq.heapify(self._expiry)
+
+
+class DatabaseStore:
+    def take(self, key, capacity, rate):
+        table = RateLimitBucket.__table__
+        now = time.time()
+
+        with db.engine.begin() as connection:
+            postgres = connection.dialect.name == "postgresql"
+            upsert = pg_insert if postgres else sqlite_insert
+            least = func.least if postgres else func.min
+
+            refilled = least(capacity, table.c.tokens + (now - table.c.updated_at) * rate)
+            stmt = upsert(table).values(key=key, tokens=capacity - 1, updated_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tokens": refilled - 1, "updated_at": now},
+                where=refilled >= 1
+            ).returning(table.c.tokens)
+            allowed = connection.execute(stmt).first() is not None
+
+        return 0 if allowed else 1 / rate
+
+
+class RateLimiter:
+    def __init__(self, shared=None):
+        self.local = LocalStore()
+        self.shared = shared
+
+    def take(self, key, capacity, rate):
+        wait = self.local.take(key, capacity, rate)
+        if wait or self.shared is None:
+            return wait
+        try:
+            return self.shared.take(key, capacity, rate)
+        except Exception as e:
+            # Si la base no responde, alcanza con el límite por proceso
+            print("Error en el rate limit compartido:", e)
+            return 0
+
+
+def _client_ip():
+    # Detrás de proxies, remote_addr ya es la IP que agregó el proxy confiable (ProxyFix en
+    # app.py, TRUSTED_PROXIES); X-Forwarded-For completo lo controla el cliente
+    return request.remote_addr or "unknown"
+
+
+IP_LIMIT = parse_rate(os.getenv("LOGIN_RATE_LIMIT_IP", "20/60"))
+EMAIL_LIMIT = parse_rate(os.getenv("LOGIN_RATE_LIMIT_EMAIL", "5/300"))
+
+limiter = RateLimiter(DatabaseStore() if os.getenv("RATE_LIMIT_BACKEND", "local").lower() == "database" else None)
+
+
+def login_throttle(view):
+    """Responde 429 con Retry-After si la IP o el email superan su límite de intentos."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True)
+        # Un JSON válido que no es un objeto ([1], "x") cuenta solo para el límite por IP
+        email = str(data.get("email") or "").strip().lower() if isinstance(data, dict) else ""
+
+        checks = [(f"login:ip:{_client_ip()}", IP_LIMIT)]
+        if email:
+            checks.append((f"login:email:{email}", EMAIL_LIMIT))
+
+        for key, (capacity, rate) in checks:
+            wait = limiter.take(key, capacity, rate)
+            if wait:
+                response = jsonify({"msg": "Demasiados intentos de inicio de sesión, intenta más tarde"})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(math.ceil(wait))
+                return response
+
+        return view(*args, **kwargs)
+
+    return wrapper
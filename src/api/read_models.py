@@ -0,0 +1,100 @@
+from sqlalchemy import select
+from api.models import db, Order, OrderDetail, User
+
+# Modelos de lectura para listados de órdenes.
+# Una sola consulta por columnas (orders + users + order_details) sin hidratar objetos ORM
+# ni disparar lazy loads; serialize() produce exactamente el mismo JSON que Order.serialize().
+
+
+class OrderLine:
+    __slots__ = ("product_name", "quantity", "unit_price")
+
+    def __init__(self, product_name, quantity, unit_price):
+        self.product_name = product_name
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    def serialize(self):
+        return {
+            "producto": self.product_name,
+            "cantidad": self.quantity,
+            "precio": self.unit_price,
+            "subtotal": round(self.unit_price * self.quantity, 2)
+        }
+
+
+class OrderRecord:
+    __slots__ = ("id", "order_code", "user_id", "cliente", "status", "total", "created_at", "details")
+
+    def __init__(self, id, order_code, user_id, cliente, status, total, created_at):
+        self.id = id
+        self.order_code = order_code
+        self.user_id = user_id
+        self.cliente = cliente
+        self.status = status
+        self.total = total
+        self.created_at = created_at
+        self.details = []
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "ordenId": self.order_code,
+            "usuarioId": self.user_id,
+            "cliente": self.cliente,
+            "estado": self.status.value,
+            "total": self.total,
+            "fecha": self.created_at.strftime("%Y-%m-%d"),
+            "detalles": [detail.serialize() for detail in self.details]
+        }
+
+
+_COLUMNS = (
+    Order.id, Order.order_code, Order.user_id, Order.status, Order.total, Order.created_at,
+    User.id, User.name, User.last_name,
+    OrderDetail.id, OrderDetail.product_name, OrderDetail.quantity, OrderDetail.unit_price
+)
+
+
+def order_records_query(stmt, order_by, offset=None, limit=None):
+    """
+    `stmt` es un select(Order) ya filtrado. Se pagina sobre los ids de órdenes
+    (no sobre las filas del join) y se ordenan las líneas de cada orden juntas.
+    """
+    page = stmt.with_only_columns(Order.id).order_by(*order_by).offset(offset).limit(limit).subquery()
+
+    return (
+        select(*_COLUMNS)
+        .join(page, page.c.id == Order.id)
+        .outerjoin(User, User.id == Order.user_id)
+        .outerjoin(OrderDetail, OrderDetail.order_id == Order.id)
+        .order_by(*order_by, OrderDetail.id)
+    )
+
+
+def iter_order_records(rows):
+    """Agrupa filas consecutivas de la misma orden y entrega cada OrderRecord al completarse."""
+    record = None
+    for (order_id, order_code, user_id, status, total, created_at,
+         found_user_id, name, last_name,
+         detail_id, product_name, quantity, unit_price) in rows:
+        if record is None or record.id != order_id:
+            if record is not None:
+                yield record
+            cliente = f"{name} {last_name}" if found_user_id is not None else "Invitado"
+            record = OrderRecord(order_id, order_code, user_id, cliente, status, total, created_at)
+        if detail_id is not None:
+            record.details.append(OrderLine(product_name, quantity, unit_price))
+
+    if record is not None:
+        yield record
+
+
+def fetch_order_records(stmt, order_by, offset=None, limit=None):
+    rows = db.session.execute(order_records_query(stmt, order_by, offset, limit))
+    return list(iter_order_records(rows))
+
+
+def fetch_order_record(order_id):
+    records = fetch_order_records(select(Order).where(Order.id == order_id), order_by=(Order.id,))
+    return records[0] if records else None
@@ -0,0 +1,85 @@
+import os
+import time
+import calendar
+import threading
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, func
+from api.models import db, Reservation, reservation_status
+
+# Carga de reservas por día para el calendario mensual del admin.
+# Un mes se arma con una sola consulta agrupada por (día, estado) y queda en cache por worker
+# hasta que se escribe una reserva de ese mes; el TTL acota lo que puede durar una copia
+# vieja en otro worker.
+
+
+def parse_month(value):
+    """'2026-10' -> date(2026, 10, 1)."""
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m").date()
+    except ValueError:
+        raise ValueError("Formato de mes inválido. Usa YYYY-MM")
+
+
+class CalendarCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._months = {}
+        self._lock = threading.Lock()
+        # Sube con cada invalidación: un mes armado mientras tanto puede no ver la reserva nueva
+        self._generation = 0
+
+    def _build(self, month):
+        days_in_month = calendar.monthrange(month.year, month.month)[1]
+        start = datetime.combine(month, datetime.min.time())
+        end = start + timedelta(days=days_in_month)
+
+        days = {
+            month + timedelta(days=offset): {"reservations": 0, "guests": 0, "by_status": {}}
+            for offset in range(days_in_month)
+        }
+        totals = {"reservations": 0, "guests": 0, "by_status": {}}
+
+        day = func.date(Reservation.start_date_time)
+        for day_value, status, count, guests in db.session.execute(
+                select(day, Reservation.status, func.count(), func.coalesce(func.sum(Reservation.quantity), 0))
+                .where(Reservation.start_date_time >= start, Reservation.start_date_time < end)
+                .group_by(day, Reservation.status)):
+            for bucket in (days[date.fromisoformat(str(day_value))], totals):
+                bucket["reservations"] += count
+                bucket["guests"] += guests
+                bucket["by_status"][status.value] = bucket["by_status"].get(status.value, 0) + count
+
+        return {
+            "month": month.strftime("%Y-%m"),
+            "statuses": [status.value for status in reservation_status],
+            "totals": totals,
+            "days": [{"date": key.isoformat(), **value} for key, value in days.items()]
+        }
+
+    def get(self, month):
+        now = time.monotonic()
+        entry = self._months.get(month)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        generation = self._generation
+        data = self._build(month)
+        with self._lock:
+            # Si hubo una invalidación durante el armado, el resultado se usa una vez pero no se guarda
+            if generation == self._generation:
+                self._months[month] = (now + self.ttl, data)
+        return data
+
+    def invalidate(self, *moments):
+        """Descarta los meses de las reservas escritas (o todos si no se indica ninguna)."""
+        with self._lock:
+            self._generation += 1
+            if not moments:
+                self._months.clear()
+                return
+            for moment in moments:
+                if moment is not None:
+                    self._months.pop(moment.date().replace(day=1), None)
+
+
+reservation_calendar = CalendarCache(ttl=int(os.getenv("RESERVATION_CALENDAR_TTL", 300)))
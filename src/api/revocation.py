@@ -0,0 +1,123 @@
+import os
+import math
+import time
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, delete
+from api.models import db, RevokedToken
+
+# Revocación de tokens (logout y "cerrar todas las sesiones" de un usuario).
+# Las revocaciones se guardan en revoked_tokens, pero cada request se valida contra una copia
+# en memoria del proceso: un set de jti y un dict user_id -> momento de la revocación.
+# - La copia se sincroniza de forma incremental cada TOKEN_REVOCATION_SYNC_SECONDS, leyendo
+#   las filas creadas desde la última sincronización (con un margen para los commits que
+#   llegan tarde). Entre sincronizaciones, una revocación hecha en otro worker puede tardar
+#   ese tiempo en aplicarse aquí; las del propio worker se aplican al instante.
+# - Las filas vencidas (sus tokens ya expiraron) se borran de la tabla y de la memoria.
+
+SYNC_OVERLAP = timedelta(seconds=60)
+PRUNE_INTERVAL = 3600
+
+
+class RevocationList:
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._jtis = {}
+        self._users = {}
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._last_sync = 0.0
+        self._last_prune = 0.0
+
+    def _add(self, row):
+        expires = row.expires_at.timestamp()
+        if row.jti:
+            self._jtis[row.jti] = expires
+        elif row.user_id is not None:
+            revoked_at = row.created_at.timestamp()
+            current = self._users.get(row.user_id)
+            if current is None or current[0] < revoked_at:
+                self._users[row.user_id] = (revoked_at, expires)
+
+    def _drop_expired(self, now):
+        for jti, expires in list(self._jtis.items()):
+            if expires <= now:
+                del self._jtis[jti]
+        for user_id, (_, expires) in list(self._users.items()):
+            if expires <= now:
+                del self._users[user_id]
+
+    def sync(self, force=False):
+        now = time.time()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if not force and now - self._last_sync < self.sync_interval:
+                return
+            self._last_sync = now
+
+            started = datetime.now()
+            stmt = select(RevokedToken).where(RevokedToken.expires_at > started)
+            if self._synced_at is not None:
+                stmt = stmt.where(RevokedToken.created_at >= self._synced_at - SYNC_OVERLAP)
+            for row in db.session.scalars(stmt):
+                self._add(row)
+            self._synced_at = started
+
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = now
+                self._drop_expired(now)
+                db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= started))
+                db.session.commit()
+
+    def is_revoked(self, payload):
+        self.sync()
+        if payload.get("jti") in self._jtis:
+            return True
+        if not self._users:
+            return False
+
+        user_id = payload.get("user_id") or payload.get("sub")
+        if not str(user_id).isdigit():
+            # Token viejo con el email como identity (ver api/identity.py)
+            from api.identity import user_cache
+            user = user_cache.get_by_email(user_id)
+            user_id = user.id if user else None
+        revoked = self._users.get(int(user_id)) if user_id is not None else None
+        # iat viene en segundos enteros: un login en el mismo segundo de la revocación se acepta
+        return revoked is not None and payload.get("iat", 0) < math.floor(revoked[0])
+
+    def _save(self, row):
+        db.session.add(row)
+        db.session.commit()
+        with self._lock:
+            self._add(row)
+
+    def revoke_token(self, payload):
+        """Revoca el token de `payload` (logout)."""
+        self._save(RevokedToken(
+            jti=payload["jti"],
+            expires_at=datetime.fromtimestamp(payload["exp"]),
+            created_at=datetime.now()
+        ))
+
+    def revoke_user(self, user_id):
+        """Revoca todos los tokens emitidos hasta ahora para el usuario."""
+        now = datetime.now()
+        self._save(RevokedToken(
+            user_id=user_id,
+            expires_at=now + current_app.config["JWT_ACCESS_TOKEN_EXPIRES"],
+            created_at=now
+        ))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "revoked_tokens": len(self._jtis),
+                "revoked_users": len(self._users),
+                "synced_at": self._synced_at.isoformat() if self._synced_at else None
+            }
+
+
+revocation_list = RevocationList(sync_interval=int(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 5)))
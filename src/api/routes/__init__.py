@@ -15,5 +15,7 @@ from .products import *
 from .kitchen import *
 from .auth import *
 from .general import *
+from .reports import *
+from .availability import *
 
 # All routes will be registered to the api Blueprint automatically 
\ No newline at end of file
@@ -1,18 +1,20 @@
 from flask import request, jsonify, render_template
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta
+import os
+from flask_jwt_extended import jwt_required, get_jwt
 from api.models import db, User, user_role
-from api.utils import send_email
-from . import api, bcrypt
+from api.outbox import queue_email
+from api.pagination import keyset_page
+from api.counters import list_total, page_count
+from api.search import search_filter
+from api.passwords import password_hasher, PasswordHasherBusy
+from api.rate_limit import login_throttle
+from api.identity import (issue_token, issue_verification_token, verification_token_required,
+                          current_user, current_user_id, user_cache, role_required)
+from api.revocation import revocation_list
+from . import api
 
 def generate_verification_token(user_id):
-    additional_claims = {"user_id": user_id}
-    token = create_access_token(
-        identity=str(user_id),
-        additional_claims=additional_claims,
-        expires_delta=timedelta(hours=24)
-    )
-    return token
+    return issue_verification_token(user_id)
 
 def send_verification_email(user_email, user_id):
     token = generate_verification_token(user_id)
@@ -23,7 +25,7 @@ def send_verification_email(user_email, user_id):
 
     verification_url = f"{frontend_url}/verify-email?token={token}"
     html_body = render_template("email_verification.html", verification_url=verification_url)
-    send_email(user_email, "Verifica tu correo electrónico", html_body, is_html=True)
+    queue_email(user_email, "Verifica tu correo electrónico", html_body, is_html=True)
 
 @api.route('/register', methods=['POST'])
 def handle_register():
@@ -52,7 +54,7 @@ def handle_register():
             }), 400
 
         role = user_role(role_str)
-        password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        password_hash = password_hasher.hash(password)
 
         new_user = User(
             name=name,
@@ -70,15 +72,21 @@ def handle_register():
 
         return jsonify({"ok": True, "msg": "Register was successful..."}), 201
 
+    except PasswordHasherBusy as e:
+        return jsonify({"ok": False, "msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
     except Exception as e:
         print("Error:", str(e))
         db.session.rollback()
         return jsonify({"ok": False, "msg": str(e)}), 500
 
 @api.route('/login', methods=['POST'])
+@login_throttle
 def handle_login():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"msg": "Email y contraseña son requeridos"}), 400
         email = data.get("email")
         password = data.get("password")
 
@@ -90,13 +98,15 @@ def handle_login():
         if not user:
             return jsonify({"msg": "Usuario no encontrado"}), 404
 
-        if not bcrypt.check_password_hash(user.password, password):
+        if not password_hasher.verify_and_update(user, password):
             return jsonify({"msg": "Contraseña incorrecta"}), 401
+        # Guarda el hash recalculado si cambió BCRYPT_LOG_ROUNDS
+        db.session.commit()
 
         if not user.is_active:
             return jsonify({"msg": "Por favor verifica tu correo electrónico"}), 401
 
-        access_token = create_access_token(identity=email)
+        access_token = issue_token(user)
         return jsonify({
             "token": access_token,
             "user": {
@@ -106,12 +116,37 @@ def handle_login():
             }
         }), 200
 
+    except PasswordHasherBusy as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
     except Exception as e:
         print("Error:", str(e))
         return jsonify({"msg": str(e)}), 500
 
-@api.route("/verify-email", methods=['POST'])
+@api.route('/logout', methods=['POST'])
 @jwt_required()
+def handle_logout():
+    try:
+        revocation_list.revoke_token(get_jwt())
+        return jsonify({"msg": "Sesión cerrada"}), 200
+
+    except Exception as e:
+        print("Error:", str(e))
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 500
+
+@api.route('/revocations/stats', methods=['GET'])
+@role_required(user_role.ADMIN.value)
+def revocation_stats():
+    return jsonify(revocation_list.stats()), 200
+
+@api.route('/password-hasher/stats', methods=['GET'])
+@role_required(user_role.ADMIN.value)
+def password_hasher_stats():
+    return jsonify(password_hasher.stats()), 200
+
+@api.route("/verify-email", methods=['POST'])
+@verification_token_required
 def handle_verify_email():
     try:
         claims = get_jwt()
@@ -126,6 +161,7 @@ def handle_verify_email():
 
         user.is_active = True
         db.session.commit()
+        user_cache.invalidate(user.id)
 
         return jsonify({"msg": "Email verificado correctamente"}), 200
 
@@ -136,8 +172,8 @@ def handle_verify_email():
 @api.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
-    user_email = get_jwt_identity()
-    user = db.session.scalar(db.select(User).where(User.email == user_email))
+    # Sale del cache de usuarios: no consulta la base en cada request
+    user = current_user()
 
     if user is None:
         return jsonify({"error": "Usuario no encontrado"}), 404
@@ -152,8 +188,8 @@ def get_profile():
 @api.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
-    user_email = get_jwt_identity()
-    user = db.session.scalar(db.select(User).where(User.email == user_email))
+    user_id = current_user_id()
+    user = db.session.get(User, user_id) if user_id else None
 
     if user is None:
         return jsonify({"error": "Usuario no encontrado"}), 404
@@ -165,8 +201,14 @@ def update_profile():
     user.email = data.get("email", user.email)
 
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify({"msg": "Perfil actualizado correctamente"}), 200
 
+@api.route('/identity/stats', methods=['GET'])
+@role_required(user_role.ADMIN.value)
+def identity_stats():
+    return jsonify(user_cache.stats()), 200
+
 @api.route('/users', methods=['GET'])
 def listar_usuarios():
     try:
@@ -178,13 +220,7 @@ def listar_usuarios():
         stmt = db.select(User)
 
         if search:
-            stmt = stmt.where(
-                db.or_(
-                    User.name.ilike(f"%{search}%"),
-                    User.last_name.ilike(f"%{search}%"),
-                    User.email.ilike(f"%{search}%")
-                )
-            )
+            stmt = stmt.where(search_filter(User, search))
 
         if role_filter:
             if role_filter in user_role.__members__:
@@ -194,7 +230,24 @@ def listar_usuarios():
                     "error": f"Rol inválido. Usa uno de: {[r.name for r in user_role]}"
                 }), 400
 
-        total = db.session.scalar(db.select(func.count()).select_from(stmt.subquery()))
+        if "cursor" in request.args:
+            try:
+                users, next_cursor, prev_cursor = keyset_page(
+                    stmt, User.created_at, User.id, request.args["cursor"], per_page, descending=True)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            return jsonify({
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "items": [user.serialize() for user in users]
+            }), 200
+
+        try:
+            total = list_total(stmt)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         stmt = stmt.order_by(User.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
         users = db.session.scalars(stmt).all()
@@ -203,7 +256,7 @@ def listar_usuarios():
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": page_count(total, per_page),
             "items": [user.serialize() for user in users]
         }), 200
 
@@ -0,0 +1,37 @@
+from flask import request, jsonify
+from datetime import datetime
+from api.availability import availability
+from . import api
+
+@api.route('/availability', methods=['GET'])
+def get_availability():
+    try:
+        date_str = request.args.get("date", "").strip()
+        time_str = request.args.get("time", "").strip()
+
+        try:
+            start = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            return jsonify({"error": "Se requieren date=YYYY-MM-DD y time=HH:MM"}), 400
+
+        try:
+            party = int(request.args.get("party", 0))
+        except ValueError:
+            party = 0
+        if party < 1:
+            return jsonify({"error": "party debe ser un número mayor a 0"}), 400
+
+        tables = availability.available_tables(start, party)
+
+        return jsonify({
+            "date": date_str,
+            "time": time_str,
+            "party": party,
+            "duration_minutes": int(availability.duration.total_seconds() // 60),
+            "available": len(tables) > 0,
+            "tables": tables
+        }), 200
+
+    except Exception as e:
+        print("Error en GET /availability:", e)
+        return jsonify({"error": str(e)}), 500
@@ -1,9 +1,25 @@
-from flask import request, jsonify
-from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
-from api.models import db, Order, OrderDetail, order_status
+import os
+import json
+import threading
+from flask import request, jsonify, Response
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select, func, update, case, literal
+from api.models import db, Order, order_status
+from api.read_models import fetch_order_records, fetch_order_record
+from api.pagination import keyset_page
+from api.counters import ORDERS, list_total, page_count, apply_deltas
+from api.events import broker, publish_order_event, publish_orders_event, KITCHEN_CHANNEL
 from . import api
 
+MAX_BULK_ORDERS = 500
+
+# Cada cliente SSE ocupa un thread de gunicorn mientras está conectado. Por encima de
+# KITCHEN_STREAM_MAX streams por proceso se responde 503 con Retry-After, así siempre quedan
+# threads para el resto de la API (dimensionamiento en el README).
+MAX_STREAMS = int(os.getenv("KITCHEN_STREAM_MAX", 4))
+STREAM_RETRY_AFTER = 15
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
 @api.route('/cocina/ordenes', methods=['GET'])
 def get_ordenes_para_cocina():
     try:
@@ -11,32 +27,50 @@ def get_ordenes_para_cocina():
         per_page = int(request.args.get("per_page", 10))
         status_filter = request.args.get("status", "").upper().strip()
 
-        stmt = select(Order).options(
-            joinedload(Order.user),
-            joinedload(Order.details).joinedload(OrderDetail.dish),
-            joinedload(Order.details).joinedload(OrderDetail.drink)
-        )
+        stmt = select(Order)
 
-        # Por defecto, mostrar órdenes pendientes y en proceso
+        # Por defecto, mostrar las órdenes en proceso (order_status no tiene PENDIENTE)
         if not status_filter:
-            stmt = stmt.where(Order.status.in_([order_status.PENDIENTE, order_status.EN_PROCESO]))
+            statuses = [order_status.EN_PROCESO]
         elif status_filter in order_status.__members__:
-            stmt = stmt.where(Order.status == order_status[status_filter])
+            statuses = [order_status[status_filter]]
         else:
             return jsonify({
                 "error": f"Estado inválido. Usa uno de: {[s.name for s in order_status]}"
             }), 400
 
-        total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+        stmt = stmt.where(Order.status.in_(statuses))
+
+        if "cursor" in request.args:
+            try:
+                orders, next_cursor, prev_cursor = keyset_page(
+                    stmt, Order.created_at, Order.id, request.args["cursor"], per_page, descending=False,
+                    fetch=fetch_order_records)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            return jsonify({
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "items": [order.serialize() for order in orders]
+            }), 200
+
+        try:
+            total = list_total(stmt, scope=ORDERS, statuses=statuses)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        stmt = stmt.order_by(Order.created_at.asc()).offset((page - 1) * per_page).limit(per_page)
-        orders = db.session.scalars(stmt).unique().all()
+        orders = fetch_order_records(
+            stmt, order_by=(Order.created_at.asc(), Order.id.asc()),
+            offset=(page - 1) * per_page, limit=per_page
+        )
 
         return jsonify({
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": page_count(total, per_page),
             "items": [order.serialize() for order in orders]
         }), 200
 
@@ -62,6 +96,9 @@ def actualizar_estado_orden(id):
         order.status = order_status[status_str]
         db.session.commit()
 
+        order = fetch_order_record(id)
+        publish_order_event("updated", order)
+
         return jsonify({
             "message": "Estado de la orden actualizado correctamente",
             "order": order.serialize()
@@ -70,4 +107,148 @@ def actualizar_estado_orden(id):
     except Exception as e:
         db.session.rollback()
         print("Error al actualizar estado de la orden:", e)
-        return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500 
+
+@api.route('/cocina/ordenes', methods=['PATCH'])
+def actualizar_estados_ordenes():
+    """
+    Cambia el estado de varias órdenes en una sola transacción.
+    Body: {"orders": [{"id": 1, "status": "COMPLETADA"}, ...]}
+    o bien {"ids": [1, 2, 3], "status": "CANCELADA"}.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        if "ids" in data:
+            if not isinstance(data["ids"], list):
+                return jsonify({"error": "ids debe ser una lista"}), 400
+            items = [{"id": order_id, "status": data.get("status")} for order_id in data["ids"]]
+        else:
+            items = data.get("orders", [])
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Se requiere una lista de órdenes"}), 400
+        if len(items) > MAX_BULK_ORDERS:
+            return jsonify({"error": f"Máximo {MAX_BULK_ORDERS} órdenes por solicitud"}), 400
+
+        results = {}
+        targets = {}
+        for item in items:
+            if not isinstance(item, dict):
+                return jsonify({"error": "Cada orden debe ser un objeto con id y status"}), 400
+            try:
+                order_id = int(item["id"])
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"error": "Cada orden debe tener un id numérico"}), 400
+
+            status_str = item.get("status") or ""
+            if not isinstance(status_str, str):
+                return jsonify({"error": "status debe ser un texto"}), 400
+            status_str = status_str.upper()
+            if status_str not in order_status.__members__:
+                results[order_id] = {"id": order_id, "result": "invalid_status"}
+                targets.pop(order_id, None)
+                continue
+            targets[order_id] = order_status[status_str]
+
+        # Estado actual de las filas afectadas, bloqueadas hasta el commit
+        current = dict(db.session.execute(
+            select(Order.id, Order.status).where(Order.id.in_(list(targets))).with_for_update()
+        ).all())
+
+        for order_id in list(targets):
+            if order_id not in current:
+                results[order_id] = {"id": order_id, "result": "not_found"}
+                del targets[order_id]
+
+        if targets:
+            by_status = {}
+            for order_id, status in targets.items():
+                by_status.setdefault(status, []).append(order_id)
+
+            status_type = Order.__table__.c.status.type
+            db.session.execute(
+                update(Order)
+                .where(Order.id.in_(list(targets)))
+                .values(status=case(
+                    *[(Order.id.in_(ids), literal(status, status_type)) for status, ids in by_status.items()]
+                ))
+                .execution_options(synchronize_session=False)
+            )
+
+            # El UPDATE masivo no pasa por before_flush: se ajustan los contadores a mano
+            deltas = {}
+            for order_id, status in targets.items():
+                if current[order_id] != status:
+                    old_key = (ORDERS, current[order_id].name, "")
+                    new_key = (ORDERS, status.name, "")
+                    deltas[old_key] = deltas.get(old_key, 0) - 1
+                    deltas[new_key] = deltas.get(new_key, 0) + 1
+            apply_deltas(db.session.connection(), deltas)
+
+        db.session.commit()
+
+        orders = []
+        if targets:
+            orders = fetch_order_records(
+                select(Order).where(Order.id.in_(list(targets))),
+                order_by=(Order.created_at.asc(), Order.id.asc())
+            )
+            publish_orders_event("updated", orders)
+
+        for order in orders:
+            results[order.id] = {"id": order.id, "result": "updated", "status": order.status.name}
+
+        return jsonify({
+            "message": f"{len(orders)} órdenes actualizadas",
+            "results": [results[order_id] for order_id in sorted(results)],
+            "orders": [order.serialize() for order in orders]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print("Error al actualizar estados de órdenes:", e)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/cocina/stream', methods=['GET'])
+@jwt_required(locations=["headers", "query_string"])
+def cocina_stream():
+    # Server-Sent Events: solo se envían los cambios de órdenes, sin volver a consultar la lista.
+    # Requiere workers que soporten conexiones largas (gunicorn -k gthread, ver Procfile).
+    # EventSource no puede mandar headers: el token también se acepta como ?jwt=<token>.
+    if not stream_slots.acquire(blocking=False):
+        # EventSource no reintenta ante un 503: el cliente debe reconectar después de Retry-After
+        return jsonify({"error": "Demasiadas pantallas conectadas, intenta de nuevo en unos segundos"}), 503, {
+            "Retry-After": str(STREAM_RETRY_AFTER)
+        }
+
+    subscription = broker.subscribe(KITCHEN_CHANNEL)
+    released = threading.Event()
+
+    def release():
+        # Al cerrar la respuesta, aunque el cliente se haya ido antes de empezar a leer
+        if not released.is_set():
+            released.set()
+            subscription.close()
+            stream_slots.release()
+
+    def generate():
+        yield "retry: 3000\n\n"
+        while True:
+            event = subscription.get(timeout=15)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    response.call_on_close(release)
+    return response
+
+@api.route('/cocina/stream/stats', methods=['GET'])
+@jwt_required()
+def cocina_stream_stats():
+    return jsonify({**broker.stats(), "max_streams": MAX_STREAMS}), 200
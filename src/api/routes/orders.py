@@ -1,10 +1,32 @@
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
-from api.models import db, Order, OrderDetail, order_status, User
+from api.models import db, Order, OrderDetail, order_status, User, Dishes, Drinks
+from api.read_models import fetch_order_records, fetch_order_record, order_records_query, iter_order_records
+from api.exports import export_format, export_range, stream_export, YIELD_PER
+from api.pagination import keyset_page
+from api.counters import ORDERS, list_total, page_count
+from api.events import publish_order_event
+from api.idempotency import idempotent
+from api.order_codes import order_codes
+from api.archive import orders_union, fetch_archived_order_records
+from api.identity import current_user_id
 from . import api
 
+def filter_orders(stmt, search, status_filter):
+    """Filtros comunes del listado y la exportación de órdenes."""
+    if search:
+        stmt = stmt.join(Order.user).where(
+            User.email.ilike(f"%{search}%")
+        )
+
+    if status_filter:
+        if status_filter not in order_status.__members__:
+            raise ValueError(f"Estado inválido. Usa uno de: {[s.name for s in order_status]}")
+        stmt = stmt.where(Order.status == order_status[status_filter])
+
+    return stmt
+
 @api.route('/orders', methods=['GET'])
 def get_orders():
     try:
@@ -13,35 +35,66 @@ def get_orders():
         search = request.args.get("search", "").strip()
         status_filter = request.args.get("status", "").upper().strip()
 
-        stmt = select(Order).options(
-            joinedload(Order.user),
-            joinedload(Order.details).joinedload(OrderDetail.dish),
-            joinedload(Order.details).joinedload(OrderDetail.drink)
-        )
+        try:
+            stmt = filter_orders(select(Order), search, status_filter)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if search:
-            stmt = stmt.join(Order.user).where(
-                User.email.ilike(f"%{search}%")
-            )
+        if request.args.get("include_archived", "").lower() == "true":
+            # Une órdenes calientes y archivadas; el total siempre es exacto (o ninguno con count=none)
+            if "cursor" in request.args:
+                return jsonify({"error": "include_archived no admite paginación por cursor"}), 400
 
-        if status_filter:
-            if status_filter in order_status.__members__:
-                stmt = stmt.where(Order.status == order_status[status_filter])
-            else:
-                return jsonify({
-                    "error": f"Estado inválido. Usa uno de: {[s.name for s in order_status]}"
-                }), 400
+            stmt = orders_union(search, [order_status[status_filter]] if status_filter else None)
+            try:
+                total = list_total(stmt)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
-        total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+            orders = fetch_archived_order_records(stmt, offset=(page - 1) * per_page, limit=per_page)
 
-        stmt = stmt.order_by(Order.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-        orders = db.session.scalars(stmt).unique().all()
+            return jsonify({
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "pages": page_count(total, per_page),
+                "items": [order.serialize() for order in orders]
+            }), 200
+
+        if "cursor" in request.args:
+            try:
+                orders, next_cursor, prev_cursor = keyset_page(
+                    stmt, Order.created_at, Order.id, request.args["cursor"], per_page, descending=True,
+                    fetch=fetch_order_records)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            return jsonify({
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "items": [order.serialize() for order in orders]
+            }), 200
+
+        try:
+            total = list_total(
+                stmt,
+                scope=None if search else ORDERS,
+                statuses=[order_status[status_filter]] if status_filter else None
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        orders = fetch_order_records(
+            stmt, order_by=(Order.created_at.desc(), Order.id.desc()),
+            offset=(page - 1) * per_page, limit=per_page
+        )
 
         return jsonify({
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": page_count(total, per_page),
             "items": [order.serialize() for order in orders]
         }), 200
 
@@ -49,55 +102,92 @@ def get_orders():
         print("Error en GET /orders:", e)
         return jsonify({"error": str(e)}), 500
 
+def _quantity(value):
+    quantity = int(value)
+    if quantity <= 0:
+        raise ValueError
+    return quantity
+
+def order_lines(data):
+    """
+    (producto, cantidad, precio unitario) de cada línea del body, con el nombre y el precio del menú.
+    Acepta dishes/drinks por id ([{"id": 1, "quantity": 2}], pantalla de meseros) e items por
+    nombre ([{"producto": "Tacos", "cantidad": 2}], pantalla de clientes).
+    Lanza ValueError si alguna línea no es válida.
+    """
+    lines = []
+    for model, key in ((Dishes, "dishes"), (Drinks, "drinks")):
+        items = data.get(key) or []
+        if not isinstance(items, list):
+            raise ValueError(f"'{key}' debe ser una lista")
+        try:
+            requested = [(int(item["id"]), _quantity(item.get("quantity"))) for item in items]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Cada elemento de '{key}' necesita id y quantity (entero positivo)")
+        if not requested:
+            continue
+
+        products = {product.id: product for product in db.session.scalars(
+            select(model).where(model.id.in_([product_id for product_id, _ in requested]), model.is_active == True))}
+        for product_id, quantity in requested:
+            product = products.get(product_id)
+            if product is None:
+                raise ValueError(f"Producto {product_id} de '{key}' no encontrado")
+            lines.append((product.name, quantity, product.price))
+
+    items = data.get("items") or []
+    if not isinstance(items, list):
+        raise ValueError("'items' debe ser una lista")
+    try:
+        requested = [(str(item["producto"]), _quantity(item.get("cantidad"))) for item in items]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Cada elemento de 'items' necesita producto y cantidad (entero positivo)")
+    if requested:
+        names = [name for name, _ in requested]
+        prices = {}
+        for model in (Drinks, Dishes):
+            # Si un plato y una bebida se llaman igual, gana el plato
+            prices.update(db.session.execute(
+                select(model.name, model.price).where(model.name.in_(names), model.is_active == True)).all())
+        for name, quantity in requested:
+            if name not in prices:
+                raise ValueError(f"Producto '{name}' no encontrado en el menú")
+            lines.append((name, quantity, prices[name]))
+
+    if not lines:
+        raise ValueError("La orden no tiene productos")
+    return lines
+
 @api.route('/orders', methods=['POST'])
 @jwt_required()
+@idempotent("orders")
 def create_order():
     try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        try:
+            lines = order_lines(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         new_order = Order(
-            user_id=current_user_id,
-            table_id=data.get("table_id"),
-            status=order_status.PENDIENTE,
-            total=0
+            order_code=order_codes.next_code(),
+            user_id=current_user_id(),
+            status=order_status.EN_PROCESO,
+            total=round(sum(quantity * unit_price for _, quantity, unit_price in lines), 2),
+            details=[
+                OrderDetail(product_name=name, quantity=quantity, unit_price=unit_price)
+                for name, quantity, unit_price in lines
+            ]
         )
-
         db.session.add(new_order)
-        db.session.flush()  # Get the order ID
-
-        total = 0
-        details = []
-
-        # Process dishes
-        for dish_item in data.get("dishes", []):
-            detail = OrderDetail(
-                order_id=new_order.id,
-                dish_id=dish_item["id"],
-                quantity=dish_item["quantity"],
-                price=dish_item["price"]
-            )
-            total += detail.price * detail.quantity
-            details.append(detail)
-
-        # Process drinks
-        for drink_item in data.get("drinks", []):
-            detail = OrderDetail(
-                order_id=new_order.id,
-                drink_id=drink_item["id"],
-                quantity=drink_item["quantity"],
-                price=drink_item["price"]
-            )
-            total += detail.price * detail.quantity
-            details.append(detail)
-
-        new_order.total = total
-        db.session.add_all(details)
         db.session.commit()
 
+        order = fetch_order_record(new_order.id)
+        publish_order_event("created", order)
+
         return jsonify({
             "message": "Orden creada exitosamente",
-            "order": new_order.serialize()
+            "order": order.serialize()
         }), 201
 
     except Exception as e:
@@ -105,6 +195,63 @@ def create_order():
         print("Error al crear orden:", e)
         return jsonify({"error": str(e)}), 500
 
+ORDER_CSV_HEADER = ["id", "ordenId", "usuarioId", "cliente", "estado", "total", "fecha",
+                    "producto", "cantidad", "precio", "subtotal"]
+
+def order_csv_rows(record):
+    # Una fila por línea de detalle; las órdenes sin detalle salen con las columnas de producto vacías
+    order = record.serialize()
+    head = [order["id"], order["ordenId"], order["usuarioId"], order["cliente"],
+            order["estado"], order["total"], record.created_at.isoformat()]
+    if not order["detalles"]:
+        return [head + ["", "", "", ""]]
+    return [head + [d["producto"], d["cantidad"], d["precio"], d["subtotal"]] for d in order["detalles"]]
+
+@api.route('/orders/export', methods=['GET'])
+def export_orders():
+    try:
+        search = request.args.get("search", "").strip()
+        status_filter = request.args.get("status", "").upper().strip()
+
+        try:
+            fmt = export_format(request.args)
+            stmt = filter_orders(select(Order), search, status_filter)
+            date_from, date_to = export_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if date_from:
+            stmt = stmt.where(Order.created_at >= date_from)
+        if date_to:
+            stmt = stmt.where(Order.created_at < date_to)
+
+        rows = db.session.execute(
+            order_records_query(stmt, order_by=(Order.created_at.asc(), Order.id.asc()))
+            .execution_options(yield_per=YIELD_PER)
+        )
+
+        return stream_export("orders", fmt, iter_order_records(rows),
+                             header=ORDER_CSV_HEADER, csv_rows=order_csv_rows)
+
+    except Exception as e:
+        print("Error en GET /orders/export:", e)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/orders/code/<string:order_code>', methods=['GET'])
+def get_order_by_code(order_code):
+    try:
+        # Usa el índice único de order_code
+        records = fetch_order_records(
+            select(Order).where(Order.order_code == order_code.upper()), order_by=(Order.id,))
+        if not records:
+            return jsonify({"error": "Orden no encontrada"}), 404
+
+        return jsonify(records[0].serialize()), 200
+
+    except Exception as e:
+        print("Error al buscar orden por código:", e)
+        return jsonify({"error": str(e)}), 500
+
 @api.route('/orders/<int:id>', methods=['DELETE'])
 def delete_order(id):
     try:
@@ -114,6 +261,7 @@ def delete_order(id):
 
         db.session.delete(order)
         db.session.commit()
+        publish_order_event("deleted", order_id=id)
 
         return jsonify({"message": "Orden eliminada correctamente"}), 200
 
@@ -140,6 +288,9 @@ def update_order_status(id):
         order.status = order_status[status_str]
         db.session.commit()
 
+        order = fetch_order_record(id)
+        publish_order_event("updated", order)
+
         return jsonify({
             "message": "Estado de la orden actualizado correctamente",
             "order": order.serialize()
@@ -154,15 +305,12 @@ def update_order_status(id):
 @jwt_required()
 def mis_ordenes():
     try:
-        current_user_id = get_jwt_identity()
+        user_id = current_user_id()
         page = int(request.args.get("page", 1))
         per_page = int(request.args.get("per_page", 10))
         status_filter = request.args.get("status", "").upper().strip()
 
-        stmt = select(Order).options(
-            joinedload(Order.details).joinedload(OrderDetail.dish),
-            joinedload(Order.details).joinedload(OrderDetail.drink)
-        ).where(Order.user_id == current_user_id)
+        stmt = select(Order).where(Order.user_id == user_id)
 
         if status_filter:
             if status_filter in order_status.__members__:
@@ -172,16 +320,37 @@ def mis_ordenes():
                     "error": f"Estado inválido. Usa uno de: {[s.name for s in order_status]}"
                 }), 400
 
-        total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+        if "cursor" in request.args:
+            try:
+                orders, next_cursor, prev_cursor = keyset_page(
+                    stmt, Order.created_at, Order.id, request.args["cursor"], per_page, descending=True,
+                    fetch=fetch_order_records)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
-        stmt = stmt.order_by(Order.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-        orders = db.session.scalars(stmt).unique().all()
+            return jsonify({
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "items": [order.serialize() for order in orders]
+            }), 200
+
+        # Los contadores no son por usuario: aquí el total siempre es exacto (o ninguno con count=none)
+        try:
+            total = list_total(stmt)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        orders = fetch_order_records(
+            stmt, order_by=(Order.created_at.desc(), Order.id.desc()),
+            offset=(page - 1) * per_page, limit=per_page
+        )
 
         return jsonify({
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": page_count(total, per_page),
             "items": [order.serialize() for order in orders]
         }), 200
 
@@ -1,17 +1,15 @@
 from flask import request, jsonify
 from api.models import db, Dishes, Drinks, dish_type, drink_type
+from api.menu_cache import menu_cache
 from . import api
 
 @api.route('/productos', methods=['GET'])
 def get_productos():
     try:
-        dishes = Dishes.query.all()
-        drinks = Drinks.query.all()
-        
-        return jsonify({
-            "dishes": [dish.serialize() for dish in dishes],
-            "drinks": [drink.serialize() for drink in drinks]
-        }), 200
+        return menu_cache.response("productos", lambda: {
+            "dishes": [dish.serialize() for dish in Dishes.query.all()],
+            "drinks": [drink.serialize() for drink in Drinks.query.all()]
+        })
     except Exception as e:
         print("Error al obtener productos:", e)
         return jsonify({"error": str(e)}), 500
@@ -19,8 +17,7 @@ def get_productos():
 @api.route('/dishes', methods=['GET'])
 def get_dishes():
     try:
-        dishes = Dishes.query.all()
-        return jsonify([dish.serialize() for dish in dishes]), 200
+        return menu_cache.response("dishes", lambda: [dish.serialize() for dish in Dishes.query.all()])
     except Exception as e:
         print("Error al obtener platos:", e)
         return jsonify({"error": str(e)}), 500
@@ -28,8 +25,7 @@ def get_dishes():
 @api.route('/drinks', methods=['GET'])
 def get_drinks():
     try:
-        drinks = Drinks.query.all()
-        return jsonify([drink.serialize() for drink in drinks]), 200
+        return menu_cache.response("drinks", lambda: [drink.serialize() for drink in Drinks.query.all()])
     except Exception as e:
         print("Error al obtener bebidas:", e)
         return jsonify({"error": str(e)}), 500
@@ -78,6 +74,7 @@ def crear_producto():
             return jsonify({"error": "Tipo de producto inválido. Usa 'PLATO' o 'BEBIDA'"}), 400
 
         db.session.commit()
+        menu_cache.invalidate()
         return jsonify({
             "message": f"{tipo.capitalize()} creado exitosamente",
             "item": item.serialize()
@@ -126,6 +123,7 @@ def actualizar_producto(tipo, id):
         item.url_img = data.get("url_img", item.url_img)
 
         db.session.commit()
+        menu_cache.invalidate()
         return jsonify({
             "message": f"{tipo.capitalize()} actualizado correctamente",
             "item": item.serialize()
@@ -153,6 +151,7 @@ def eliminar_producto(tipo, id):
 
         db.session.delete(item)
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify({"message": f"{tipo.capitalize()} eliminado correctamente"}), 200
 
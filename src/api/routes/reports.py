@@ -0,0 +1,35 @@
+from flask import request, jsonify
+from datetime import datetime, date, timedelta
+from api.sales import sales_report
+from api.identity import role_required
+from api.models import user_role
+from . import api
+
+@api.route('/reports/sales', methods=['GET'])
+@role_required(user_role.ADMIN.value)
+def get_sales_report():
+    try:
+        group_by = request.args.get("group_by", "day").lower().strip()
+        if group_by not in ("day", "week", "product"):
+            return jsonify({"error": "group_by inválido. Usa uno de: ['day', 'week', 'product']"}), 400
+
+        try:
+            date_to = datetime.strptime(request.args["to"], "%Y-%m-%d").date() if request.args.get("to") else date.today()
+            date_from = datetime.strptime(request.args["from"], "%Y-%m-%d").date() if request.args.get("from") \
+                else date_to - timedelta(days=30)
+        except ValueError:
+            return jsonify({"error": "Formato de fecha inválido. Usa YYYY-MM-DD"}), 400
+
+        if date_from > date_to:
+            return jsonify({"error": "'from' debe ser anterior o igual a 'to'"}), 400
+
+        return jsonify({
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat(),
+            "group_by": group_by,
+            "items": sales_report(date_from, date_to, group_by)
+        }), 200
+
+    except Exception as e:
+        print("Error en GET /reports/sales:", e)
+        return jsonify({"error": str(e)}), 500
@@ -1,11 +1,71 @@
+import re
 from flask import request, jsonify
-from datetime import datetime
-from sqlalchemy import select, or_, func
-from api.models import db, Reservation, Table, reservation_status, table_status
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from api.models import db, Reservation, ReservationExtraTable, Table, reservation_status, table_status
 from api.utils import send_email_reservation
+from api.pagination import keyset_page
+from api.counters import RESERVATIONS, list_total, page_count
+from api.idempotency import idempotent
+from api.exports import export_format, export_range, stream_export, YIELD_PER
+from api.availability import availability, find_conflict, ACTIVE_STATUSES
+from api.reservation_calendar import reservation_calendar, parse_month
+from api.table_assignment import assign_tables
+from api.search import search_filter
 from . import api
 
+# Restricción de exclusión de PostgreSQL (ver migración) que impide reservas superpuestas por mesa
+OVERLAP_CONSTRAINT = "reservations_no_overlap"
+# El trigger de PostgreSQL informa con qué reserva choca: "reservations_no_overlap: reserva 42 ..."
+CONFLICT_ID = re.compile(OVERLAP_CONSTRAINT + r": reserva (\d+)")
+
+def conflict_response(conflict):
+    return jsonify({
+        "error": "La mesa ya tiene una reserva en ese horario",
+        "conflict": conflict.serialize() if conflict else None
+    }), 409
+
+def overlap_conflict(error, table_id, start, exclude_id=None):
+    """Reserva con la que chocó una violación de reservations_no_overlap (después del rollback)."""
+    match = CONFLICT_ID.search(str(error.orig))
+    if match:
+        return db.session.get(Reservation, int(match.group(1)))
+    return find_conflict(table_id, start, exclude_id=exclude_id) if table_id else None
+
+def filter_reservations(stmt, search, status_filter, date_filter):
+    """
+    Filtros comunes del listado y la exportación de reservas.
+    Devuelve (stmt, statuses, date_obj); lanza ValueError si algún filtro no es válido.
+    """
+    statuses = None
+    date_obj = None
+
+    if search:
+        stmt = stmt.where(search_filter(Reservation, search))
+
+    if status_filter:
+        if status_filter not in reservation_status.__members__:
+            raise ValueError(f"Estado inválido. Usa uno de: {[s.name for s in reservation_status]}")
+        statuses = [reservation_status[status_filter]]
+        stmt = stmt.where(Reservation.status == statuses[0])
+
+    if date_filter:
+        try:
+            date_obj = datetime.strptime(date_filter, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Formato de fecha inválido. Usa YYYY-MM-DD")
+        # Rango semiabierto [día, día siguiente) en lugar de date(columna) para poder usar el índice
+        day_start = datetime.combine(date_obj, datetime.min.time())
+        stmt = stmt.where(
+            Reservation.start_date_time >= day_start,
+            Reservation.start_date_time < day_start + timedelta(days=1)
+        )
+
+    return stmt, statuses, date_obj
+
 @api.route('/reservations', methods=['POST', 'GET'])
+@idempotent("reservations")
 def create_reservation():
     if request.method == 'POST':
         data = request.get_json()
@@ -31,6 +91,15 @@ def create_reservation():
                 additional_details=data.get("additional_details")
             )
 
+            # Después de un rollback se necesitan para buscar la reserva en conflicto
+            table_id, start = new_reservation.table_id, new_reservation.start_date_time
+
+            if new_reservation.table_id and status_enum in ACTIVE_STATUSES:
+                conflict = find_conflict(new_reservation.table_id, new_reservation.start_date_time)
+                if conflict:
+                    db.session.rollback()
+                    return conflict_response(conflict)
+
             db.session.add(new_reservation)
 
             if data.get("table_id") and status_enum in [reservation_status.PENDIENTE, reservation_status.CONFIRMADA]:
@@ -39,6 +108,8 @@ def create_reservation():
                     table.status = table_status.RESERVADA
 
             db.session.commit()
+            availability.invalidate(new_reservation.start_date_time)
+            reservation_calendar.invalidate(new_reservation.start_date_time)
 
             email_sent = send_email_reservation(data)
 
@@ -48,6 +119,13 @@ def create_reservation():
                 "email_sent": email_sent
             }), 201
 
+        except IntegrityError as e:
+            db.session.rollback()
+            if OVERLAP_CONSTRAINT in str(e.orig):
+                return conflict_response(overlap_conflict(e, table_id, start))
+            print("Error al crear reservación:", e)
+            return jsonify({"error": str(e)}), 500
+
         except Exception as e:
             db.session.rollback()
             print("Error al crear reservación:", e)
@@ -61,32 +139,29 @@ def create_reservation():
             status_filter = request.args.get("status", "").upper().strip()
             date_filter = request.args.get("date", "").strip()
 
-            stmt = select(Reservation)
-
-            if search:
-                stmt = stmt.where(
-                    or_(
-                        Reservation.guest_name.ilike(f"%{search}%"),
-                        Reservation.email.ilike(f"%{search}%")
-                    )
-                )
-
-            if status_filter:
-                if status_filter in reservation_status.__members__:
-                    stmt = stmt.where(Reservation.status == reservation_status[status_filter])
-                else:
-                    return jsonify({
-                        "error": f"Estado inválido. Usa uno de: {[s.name for s in reservation_status]}"
-                    }), 400
-
-            if date_filter:
+            try:
+                stmt, statuses, date_obj = filter_reservations(select(Reservation), search, status_filter, date_filter)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            if "cursor" in request.args:
                 try:
-                    date_obj = datetime.strptime(date_filter, "%Y-%m-%d").date()
-                    stmt = stmt.where(func.date(Reservation.start_date_time) == date_obj)
-                except ValueError:
-                    return jsonify({"error": "Formato de fecha inválido. Usa YYYY-MM-DD"}), 400
+                    reservations, next_cursor, prev_cursor = keyset_page(
+                        stmt, Reservation.start_date_time, Reservation.id, request.args["cursor"], per_page, descending=True)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
 
-            total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+                return jsonify({
+                    "per_page": per_page,
+                    "next_cursor": next_cursor,
+                    "prev_cursor": prev_cursor,
+                    "items": [reservation.serialize() for reservation in reservations]
+                }), 200
+
+            try:
+                total = list_total(stmt, scope=None if search else RESERVATIONS, statuses=statuses, day=date_obj)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
             stmt = stmt.order_by(Reservation.start_date_time.desc()).offset((page - 1) * per_page).limit(per_page)
             reservations = db.session.scalars(stmt).all()
@@ -95,7 +170,7 @@ def create_reservation():
                 "total": total,
                 "page": page,
                 "per_page": per_page,
-                "pages": (total + per_page - 1) // per_page,
+                "pages": page_count(total, per_page),
                 "items": [res.serialize() for res in reservations]
             }), 200
 
@@ -103,6 +178,91 @@ def create_reservation():
             print("Error en GET /reservations:", e)
             return jsonify({"error": str(e)}), 500
 
+RESERVATION_CSV_HEADER = ["id", "user_id", "guest_name", "guest_phone", "email", "quantity",
+                          "table_id", "status", "start_date_time", "additional_details", "created_at"]
+
+def reservation_csv_rows(reservation):
+    data = reservation.serialize()
+    return [[data[column] for column in RESERVATION_CSV_HEADER]]
+
+@api.route('/reservations/export', methods=['GET'])
+def export_reservations():
+    try:
+        search = request.args.get("search", "").strip()
+        status_filter = request.args.get("status", "").upper().strip()
+        date_filter = request.args.get("date", "").strip()
+
+        try:
+            fmt = export_format(request.args)
+            stmt, _, _ = filter_reservations(select(Reservation), search, status_filter, date_filter)
+            date_from, date_to = export_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if date_from:
+            stmt = stmt.where(Reservation.start_date_time >= date_from)
+        if date_to:
+            stmt = stmt.where(Reservation.start_date_time < date_to)
+
+        stmt = stmt.order_by(Reservation.start_date_time.asc(), Reservation.id.asc())
+        reservations = db.session.scalars(stmt.execution_options(yield_per=YIELD_PER))
+
+        return stream_export("reservations", fmt, reservations,
+                             header=RESERVATION_CSV_HEADER, csv_rows=reservation_csv_rows)
+
+    except Exception as e:
+        print("Error en GET /reservations/export:", e)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/reservations/calendar', methods=['GET'])
+def get_reservations_calendar():
+    try:
+        try:
+            month = parse_month(request.args.get("month") or datetime.now().strftime("%Y-%m"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(reservation_calendar.get(month)), 200
+
+    except Exception as e:
+        print("Error en GET /reservations/calendar:", e)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/reservations/assign-tables', methods=['POST'])
+def assign_reservation_tables():
+    try:
+        data = request.get_json(silent=True) or {}
+
+        try:
+            day = datetime.strptime(str(data.get("date", "")).strip(), "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify({"error": "Se requiere date=YYYY-MM-DD"}), 400
+
+        try:
+            result = assign_tables(
+                day,
+                reassign=bool(data.get("reassign", False)),
+                exact=str(data.get("exact", "auto")).lower(),
+                dry_run=bool(data.get("dry_run", False))
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(result), 200
+
+    except IntegrityError as e:
+        db.session.rollback()
+        if OVERLAP_CONSTRAINT in str(e.orig):
+            # Una reserva manual cambió las mesas entre la lectura y el commit: se puede reintentar
+            return jsonify({"error": "Las reservas cambiaron durante la asignación, intenta de nuevo"}), 409
+        print("Error en POST /reservations/assign-tables:", e)
+        return jsonify({"error": str(e)}), 500
+
+    except Exception as e:
+        db.session.rollback()
+        print("Error en POST /reservations/assign-tables:", e)
+        return jsonify({"error": str(e)}), 500
+
 @api.route('/reservations/<int:id>', methods=['PUT'])
 def update_reservation(id):
     try:
@@ -112,6 +272,7 @@ def update_reservation(id):
         if not reserva:
             return jsonify({"error": "Reserva no encontrada"}), 404
 
+        previous_start = reserva.start_date_time
         reserva.guest_name = data.get('guest_name', reserva.guest_name)
         reserva.email = data.get('email', reserva.email)
         reserva.guest_phone = data.get('guest_phone', reserva.guest_phone)
@@ -133,6 +294,13 @@ def update_reservation(id):
             except ValueError:
                 return jsonify({"error": "Formato de fecha inválido. Usa YYYY-MM-DD HH:MM:SS"}), 400
 
+        # El rollback de un IntegrityError vuelve a cargar los valores viejos de reserva
+        table_id, start = reserva.table_id, reserva.start_date_time
+
+        if reserva.start_date_time != previous_start:
+            # Cambiar el horario deshace la combinación de mesas de assign-tables
+            db.session.execute(delete(ReservationExtraTable).where(ReservationExtraTable.reservation_id == id))
+
         if reserva.table_id:
             table = db.session.get(Table, reserva.table_id)
             if table:
@@ -143,9 +311,24 @@ def update_reservation(id):
                 elif reserva.status in [reservation_status.COMPLETADA, reservation_status.CANCELADA]:
                     table.status = table_status.LIBRE
 
+            if reserva.status in ACTIVE_STATUSES:
+                conflict = find_conflict(reserva.table_id, reserva.start_date_time, exclude_id=reserva.id)
+                if conflict:
+                    db.session.rollback()
+                    return conflict_response(conflict)
+
         db.session.commit()
+        availability.invalidate(previous_start, reserva.start_date_time)
+        reservation_calendar.invalidate(previous_start, reserva.start_date_time)
         return jsonify({"message": "Reserva actualizada correctamente"}), 200
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if OVERLAP_CONSTRAINT in str(e.orig):
+            return conflict_response(overlap_conflict(e, table_id, start, exclude_id=id))
+        print("Error al actualizar la reserva:", e)
+        return jsonify({"error": "Ocurrió un error al actualizar la reserva"}), 500
+
     except Exception as e:
         db.session.rollback()
         print("Error al actualizar la reserva:", e)
@@ -164,8 +347,12 @@ def delete_reservation(id):
             if table:
                 table.status = table_status.LIBRE
 
+        start_date_time = reserva.start_date_time
+        db.session.execute(delete(ReservationExtraTable).where(ReservationExtraTable.reservation_id == id))
         db.session.delete(reserva)
         db.session.commit()
+        availability.invalidate(start_date_time)
+        reservation_calendar.invalidate(start_date_time)
 
         return jsonify({"message": "Reserva eliminada correctamente"}), 200
 
@@ -1,5 +1,7 @@
 from flask import request, jsonify
-from api.models import db, Table, table_status
+from sqlalchemy import select, delete, or_
+from api.models import db, Table, TableLink, ReservationExtraTable, table_status
+from api.availability import availability
 from . import api
 
 @api.route('/tables', methods=['POST', 'GET'])
@@ -24,6 +26,7 @@ def handle_table():
 
             db.session.add(new_table)
             db.session.commit()
+            availability.invalidate()
 
             return jsonify({
                 "msg": "Mesa creada exitosamente",
@@ -65,6 +68,7 @@ def update_table(id):
             table.status = table_status[status_str]
 
         db.session.commit()
+        availability.invalidate()
         return jsonify({"message": "Mesa actualizada correctamente"}), 200
 
     except Exception as e:
@@ -80,12 +84,54 @@ def delete_table(id):
         if not table:
             return jsonify({"error": "Mesa no encontrada"}), 404
 
+        db.session.execute(delete(TableLink).where(or_(TableLink.table_id == id, TableLink.adjacent_id == id)))
+        db.session.execute(delete(ReservationExtraTable).where(ReservationExtraTable.table_id == id))
         db.session.delete(table)
         db.session.commit()
+        availability.invalidate()
 
         return jsonify({"message": "Mesa eliminada correctamente"}), 200
 
     except Exception as e:
         db.session.rollback()
         print("Error al eliminar la mesa:", e)
-        return jsonify({"error": "Ocurrió un error al eliminar la mesa"}), 500 
\ No newline at end of file
+        return jsonify({"error": "Ocurrió un error al eliminar la mesa"}), 500
+
+@api.route('/tables/links', methods=['GET'])
+def get_table_links():
+    try:
+        links = db.session.execute(
+            select(TableLink.table_id, TableLink.adjacent_id).order_by(TableLink.table_id, TableLink.adjacent_id)
+        ).all()
+        return jsonify([[table_id, adjacent_id] for table_id, adjacent_id in links]), 200
+    except Exception as e:
+        print("Error al obtener mesas combinables:", e)
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/tables/links', methods=['PUT'])
+def replace_table_links():
+    """Reemplaza los pares de mesas que se pueden juntar: {"links": [[1, 2], [2, 3]]}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        pairs = set()
+        for link in data.get("links", []):
+            if (not isinstance(link, (list, tuple)) or len(link) != 2
+                    or not all(isinstance(table_id, int) for table_id in link) or link[0] == link[1]):
+                return jsonify({"error": "Cada par debe ser [mesa, mesa] con dos mesas distintas"}), 400
+            pairs.add((min(link), max(link)))
+
+        table_ids = {table_id for pair in pairs for table_id in pair}
+        found = set(db.session.scalars(select(Table.id).where(Table.id.in_(table_ids))))
+        if table_ids - found:
+            return jsonify({"error": f"Mesas no encontradas: {sorted(table_ids - found)}"}), 404
+
+        db.session.execute(delete(TableLink))
+        db.session.add_all(TableLink(table_id=a, adjacent_id=b) for a, b in sorted(pairs))
+        db.session.commit()
+
+        return jsonify([[a, b] for a, b in sorted(pairs)]), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print("Error al actualizar mesas combinables:", e)
+        return jsonify({"error": "Ocurrió un error al actualizar las mesas combinables"}), 500
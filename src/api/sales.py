@@ -0,0 +1,142 @@
+import os
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, func, delete, literal, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from api.models import db, Order, OrderDetail, SalesDaily, JobWatermark, order_status
+from api.archive import order_sources
+
+# Resumen de ventas por (día, producto) mantenido de forma incremental a partir de una
+# marca de agua sobre orders.created_at. Cada corrida procesa solo las órdenes nuevas
+# hasta now - SALES_ROLLUP_LAG_MINUTES, para no saltar transacciones que aún no hicieron commit.
+# Las órdenes canceladas no se cuentan; una cancelación posterior al resumen se corrige
+# con `flask rollup-sales --rebuild`, que lee también las tablas de archivo (api/archive.py).
+
+WATERMARK = "sales_daily"
+TOTAL = ""
+ROLLUP_LAG = timedelta(minutes=int(os.getenv("SALES_ROLLUP_LAG_MINUTES", 60)))
+
+
+def _aggregate(start, end, sources=None):
+    """
+    Filas (día, producto, cantidad, ingresos, órdenes) para órdenes con start < created_at <= end.
+    `sources` son pares (órdenes, detalles); por defecto solo las tablas calientes.
+    """
+    selects = []
+    for orders, details in sources or [(Order.__table__, OrderDetail.__table__)]:
+        stmt = (
+            select(details.c.order_id, details.c.product_name, details.c.quantity,
+                   details.c.unit_price, func.date(orders.c.created_at).label("day"))
+            .join(orders, orders.c.id == details.c.order_id)
+            .where(orders.c.created_at <= end, orders.c.status != order_status.CANCELADA)
+        )
+        if start is not None:
+            stmt = stmt.where(orders.c.created_at > start)
+        selects.append(stmt)
+    lines = (union_all(*selects) if len(selects) > 1 else selects[0]).subquery()
+
+    revenue = func.sum(lines.c.quantity * lines.c.unit_price)
+    by_product = (
+        select(lines.c.day, lines.c.product_name, func.sum(lines.c.quantity), revenue,
+               func.count(func.distinct(lines.c.order_id)))
+        .group_by(lines.c.day, lines.c.product_name)
+    )
+    by_day = (
+        select(lines.c.day, literal(TOTAL), func.sum(lines.c.quantity), revenue,
+               func.count(func.distinct(lines.c.order_id)))
+        .group_by(lines.c.day)
+    )
+    for query in (by_product, by_day):
+        for day_value, product_name, quantity, amount, orders in db.session.execute(query):
+            yield date.fromisoformat(str(day_value)), product_name, quantity, amount, orders
+
+
+def _upsert(connection, rows):
+    table = SalesDaily.__table__
+    upsert = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+
+    for day_value, product_name, quantity, amount, orders in rows:
+        stmt = upsert(table).values(day=day_value, product_name=product_name, quantity=quantity,
+                                    revenue=amount, order_count=orders)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.product_name],
+            set_={
+                "quantity": table.c.quantity + stmt.excluded.quantity,
+                "revenue": table.c.revenue + stmt.excluded.revenue,
+                "order_count": table.c.order_count + stmt.excluded.order_count
+            }
+        )
+        connection.execute(stmt)
+
+
+def rollup_sales():
+    """Agrega al resumen las órdenes creadas desde la última corrida. Devuelve la nueva marca de agua."""
+    watermark = db.session.get(JobWatermark, WATERMARK, with_for_update=True)
+    start = watermark.value if watermark else None
+    end = datetime.now() - ROLLUP_LAG
+    if start is not None and end <= start:
+        return start
+
+    _upsert(db.session.connection(), list(_aggregate(start, end)))
+
+    if watermark is None:
+        db.session.add(JobWatermark(name=WATERMARK, value=end))
+    else:
+        watermark.value = end
+    db.session.commit()
+    return end
+
+
+def rebuild_sales(date_from, date_to):
+    """Recalcula desde cero los días [date_from, date_to] que ya cubre la marca de agua."""
+    watermark = db.session.get(JobWatermark, WATERMARK, with_for_update=True)
+    if watermark is None:
+        return
+
+    start = datetime.combine(date_from, datetime.min.time())
+    end = min(datetime.combine(date_to + timedelta(days=1), datetime.min.time()), watermark.value)
+
+    db.session.execute(delete(SalesDaily).where(SalesDaily.day >= date_from, SalesDaily.day <= date_to))
+    # _aggregate usa start exclusivo: se corre un instante antes para incluir la medianoche
+    # Las órdenes viejas pueden estar archivadas: se suman la tabla caliente y los archivos
+    rows = list(_aggregate(start - timedelta(microseconds=1), end, order_sources()))
+    _upsert(db.session.connection(), rows)
+    db.session.commit()
+
+
+def sales_report(date_from, date_to, group_by="day"):
+    stmt = select(SalesDaily).where(SalesDaily.day >= date_from, SalesDaily.day <= date_to)
+
+    if group_by == "product":
+        stmt = select(
+            SalesDaily.product_name, func.sum(SalesDaily.quantity),
+            func.sum(SalesDaily.revenue), func.sum(SalesDaily.order_count)
+        ).where(
+            SalesDaily.day >= date_from, SalesDaily.day <= date_to, SalesDaily.product_name != TOTAL
+        ).group_by(SalesDaily.product_name).order_by(func.sum(SalesDaily.revenue).desc())
+
+        return [{
+            "product": product_name,
+            "quantity": quantity,
+            "revenue": round(amount, 2),
+            "orders": orders
+        } for product_name, quantity, amount, orders in db.session.execute(stmt)]
+
+    rows = db.session.scalars(stmt.where(SalesDaily.product_name == TOTAL).order_by(SalesDaily.day)).all()
+
+    buckets = {}
+    for row in rows:
+        # Semanas ISO: se agrupan por su lunes
+        key = row.day - timedelta(days=row.day.weekday()) if group_by == "week" else row.day
+        bucket = buckets.setdefault(key, {"quantity": 0, "revenue": 0.0, "orders": 0})
+        bucket["quantity"] += row.quantity
+        bucket["revenue"] += row.revenue
+        bucket["orders"] += row.order_count
+
+    label = "week" if group_by == "week" else "day"
+    return [{
+        label: key.isoformat(),
+        "quantity": bucket["quantity"],
+        "revenue": round(bucket["revenue"], 2),
+        "orders": bucket["orders"]
+    } for key, bucket in buckets.items()]
@@ -0,0 +1,71 @@
+import unicodedata
+from sqlalchemy import event, inspect, select, text, table, column, true, and_
+from sqlalchemy.orm import Session
+from api.models import db, User, Reservation
+
+# Búsqueda de usuarios y reservas para el buscador del admin.
+# Cada modelo guarda en search_key sus campos de búsqueda normalizados (minúsculas, sin
+# acentos), actualizado en before_flush. Sobre esa columna:
+# - PostgreSQL: índice GIN pg_trgm, que sirve para LIKE '%palabra%'.
+# - SQLite: tabla FTS5 users_search / reservations_search sincronizada por triggers,
+#   consultada con prefijos ("pala"*).
+# Ambos índices se crean en la migración; sin ellos se cae al LIKE sobre search_key.
+
+SEARCH_FIELDS = {
+    User: ("users_search", ("name", "last_name", "email")),
+    Reservation: ("reservations_search", ("guest_name", "email")),
+}
+
+_fts_tables = {}
+
+
+def normalize(*values):
+    """'José  Pérez' -> 'jose perez'"""
+    joined = " ".join(value for value in values if value)
+    decomposed = unicodedata.normalize("NFKD", joined)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+@event.listens_for(Session, "before_flush")
+def _update_search_keys(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        spec = SEARCH_FIELDS.get(type(obj))
+        if spec is None:
+            continue
+        fields = spec[1]
+        state = inspect(obj)
+        if obj in session.new or any(state.attrs[field].history.has_changes() for field in fields):
+            obj.search_key = normalize(*(getattr(obj, field) for field in fields))
+
+
+def _has_fts(table_name):
+    """True si la base es SQLite y la migración creó la tabla FTS5 (se cachea por worker)."""
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    key = (engine.url, table_name)
+    if key not in _fts_tables:
+        _fts_tables[key] = inspect(engine).has_table(table_name)
+    return _fts_tables[key]
+
+
+def _like_escape(word):
+    return word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_filter(model, term):
+    """Condición WHERE para `term`: todas sus palabras deben aparecer en los campos del modelo."""
+    words = normalize(term).split()
+    if not words:
+        return true()
+
+    fts_table = SEARCH_FIELDS[model][0]
+    if _has_fts(fts_table):
+        query = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        fts = table(fts_table, column("rowid"))
+        return model.id.in_(
+            select(fts.c.rowid).where(text(f"{fts_table} MATCH :search_query").bindparams(search_query=query))
+        )
+
+    return and_(*(model.search_key.like(f"%{_like_escape(word)}%", escape="\\") for word in words))
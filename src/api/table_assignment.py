@@ -0,0 +1,272 @@
+import os
+import bisect
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func
+from api.models import db, Reservation, ReservationExtraTable, Table, TableLink
+from api.availability import DayIndex, ACTIVE_STATUSES, availability
+
+# Asignación de mesas para todas las reservas activas de una noche.
+#
+# Cada reserva ocupa su mesa (o un grupo de mesas adyacentes combinadas) desde su inicio hasta
+# su fin guardado, así que una mesa puede atender varias reservas si no se superponen.
+# - Heurística best-fit decreasing: grupos grandes primero, cada uno a la opción libre
+#   con menos sillas de sobra (a igualdad, menos mesas combinadas).
+# - Con pocas reservas (ASSIGN_EXACT_LIMIT) se busca el óptimo por branch and bound,
+#   partiendo del costo de la heurística y con un límite de nodos.
+# El costo de una asignación es la suma de sillas desperdiciadas; dejar una reserva sin
+# mesa cuesta más que cualquier desperdicio.
+
+MAX_COMBINED = int(os.getenv("ASSIGN_MAX_COMBINED_TABLES", 3))
+EXACT_LIMIT = int(os.getenv("ASSIGN_EXACT_LIMIT", 12))
+EXACT_NODE_LIMIT = 50000
+EXACT_MODES = ("auto", "always", "never")
+UNSEATED_COST = 100000
+
+
+class TableOption:
+    __slots__ = ("tables", "chairs")
+
+    def __init__(self, tables, chairs):
+        # La mesa con más sillas es la principal (Reservation.table_id)
+        self.tables = tables
+        self.chairs = chairs
+
+
+class Schedule:
+    """Intervalos ocupados por mesa sobre un DayIndex, que se arma y se deshace durante la búsqueda."""
+
+    def __init__(self):
+        self.index = DayIndex(None, (), None)
+
+    def is_free(self, option, start, end):
+        return all(self.index.is_free(table_id, start, end) for table_id in option.tables)
+
+    def add(self, tables, start, end):
+        for table_id in tables:
+            self.index.add(table_id, start, end)
+
+    def remove(self, tables, start, end):
+        for table_id in tables:
+            self.index.remove(table_id, start, end)
+
+
+def table_options(tables, links, max_combined=MAX_COMBINED):
+    """Mesas solas y grupos conexos de hasta `max_combined` mesas adyacentes, de menor a mayor."""
+    chairs = {table_id: table_chairs for table_id, _, table_chairs in tables}
+    numbers = {table_id: number for table_id, number, _ in tables}
+    adjacency = {table_id: set() for table_id in chairs}
+    for table_id, adjacent_id in links:
+        if table_id in adjacency and adjacent_id in adjacency:
+            adjacency[table_id].add(adjacent_id)
+            adjacency[adjacent_id].add(table_id)
+
+    groups = set()
+    frontier = {frozenset([table_id]) for table_id in chairs}
+    for size in range(1, max_combined + 1):
+        groups |= frontier
+        if size == max_combined:
+            break
+        frontier = {
+            group | {neighbor}
+            for group in frontier
+            for table_id in group
+            for neighbor in adjacency[table_id] - group
+        } - groups
+
+    options = []
+    for group in groups:
+        ordered = tuple(sorted(group, key=lambda table_id: (-chairs[table_id], numbers[table_id])))
+        options.append(TableOption(ordered, sum(chairs[table_id] for table_id in group)))
+    options.sort(key=lambda option: (option.chairs, len(option.tables), [numbers[t] for t in option.tables]))
+    return options
+
+
+def _cost(option, quantity):
+    if option is None:
+        return UNSEATED_COST + quantity
+    # Desperdicio de sillas y, a igualdad, menos mesas combinadas
+    return (option.chairs - quantity) * 10 + len(option.tables) - 1
+
+
+def best_fit_decreasing(requests, options, schedule):
+    """`requests`: lista de (id, cantidad, inicio, fin). Devuelve {id: TableOption o None}."""
+    capacities = [option.chairs for option in options]
+    plan = {}
+    for reservation_id, quantity, start, end in sorted(requests, key=lambda r: (-r[1], r[2], r[0])):
+        plan[reservation_id] = None
+        for option in options[bisect.bisect_left(capacities, quantity):]:
+            if schedule.is_free(option, start, end):
+                schedule.add(option.tables, start, end)
+                plan[reservation_id] = option
+                break
+    return plan
+
+
+def exact_assignment(requests, options, schedule, initial_plan, node_limit=EXACT_NODE_LIMIT):
+    """Branch and bound sobre las reservas (grandes primero); devuelve el mejor plan encontrado."""
+    ordered = sorted(requests, key=lambda r: (-r[1], r[2], r[0]))
+    capacities = [option.chairs for option in options]
+    candidates = [options[bisect.bisect_left(capacities, quantity):] for _, quantity, _, _ in ordered]
+
+    # Cota inferior de lo que falta: la mejor opción de cada reserva ignorando horarios
+    floors = [_cost(found[0] if found else None, quantity) for found, (_, quantity, _, _) in zip(candidates, ordered)]
+    remaining = [0] * (len(ordered) + 1)
+    for position in range(len(ordered) - 1, -1, -1):
+        remaining[position] = remaining[position + 1] + floors[position]
+
+    best = {"cost": sum(_cost(initial_plan[r[0]], r[1]) for r in ordered), "plan": dict(initial_plan)}
+    current = {}
+    nodes = 0
+
+    def search(position, cost):
+        nonlocal nodes
+        nodes += 1
+        if nodes > node_limit or cost + remaining[position] >= best["cost"]:
+            return
+        if position == len(ordered):
+            best["cost"] = cost
+            best["plan"] = dict(current)
+            return
+
+        reservation_id, quantity, start, end = ordered[position]
+        for option in candidates[position]:
+            # Las opciones están ordenadas por costo creciente: si esta no mejora, ninguna de las siguientes
+            if cost + _cost(option, quantity) + remaining[position + 1] >= best["cost"]:
+                break
+            if schedule.is_free(option, start, end):
+                schedule.add(option.tables, start, end)
+                current[reservation_id] = option
+                search(position + 1, cost + _cost(option, quantity))
+                schedule.remove(option.tables, start, end)
+        current[reservation_id] = None
+        search(position + 1, cost + _cost(None, quantity))
+        del current[reservation_id]
+
+    search(0, 0)
+    return best["plan"]
+
+
+def assign_tables(day, reassign=False, exact="auto", dry_run=False):
+    """
+    Asigna mesas a las reservas PENDIENTE/CONFIRMADA que empiezan en `day`.
+    Sin `reassign` solo se asignan las que no tienen mesa y las demás se respetan.
+    Escribe todo en una transacción salvo con `dry_run`.
+    """
+    if exact not in EXACT_MODES:
+        raise ValueError(f"exact debe ser uno de: {list(EXACT_MODES)}")
+
+    started = time.perf_counter()
+    day_start = datetime.combine(day, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+
+    # Bloquea las mesas como find_conflict: una reserva manual concurrente espera al commit
+    db.session.execute(update(Table).values(id=Table.id).execution_options(synchronize_session=False))
+
+    tables = db.session.execute(select(Table.id, Table.number, Table.chairs)).all()
+    links = db.session.execute(select(TableLink.table_id, TableLink.adjacent_id)).all()
+    options = table_options(tables, links)
+
+    night_end = select(func.max(Reservation.end_date_time)).where(
+        Reservation.status.in_(ACTIVE_STATUSES),
+        Reservation.start_date_time >= day_start,
+        Reservation.start_date_time < day_end
+    ).scalar_subquery()
+    reservations = db.session.scalars(
+        select(Reservation)
+        .where(
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.end_date_time > day_start,
+            # Incluye las de la noche siguiente que empiezan antes de que termine la última de esta
+            Reservation.start_date_time < func.coalesce(night_end, day_end)
+        )
+        .order_by(Reservation.start_date_time, Reservation.id)
+        .with_for_update()
+    ).all()
+    extras = {}
+    for reservation_id, table_id in db.session.execute(
+            select(ReservationExtraTable.reservation_id, ReservationExtraTable.table_id)
+            .where(ReservationExtraTable.reservation_id.in_([r.id for r in reservations]))):
+        extras.setdefault(reservation_id, []).append(table_id)
+
+    targets = [
+        reservation for reservation in reservations
+        if day_start <= reservation.start_date_time < day_end and (reassign or reservation.table_id is None)
+    ]
+    target_ids = {reservation.id for reservation in targets}
+
+    # Lo que no se reasigna (incluidas reservas de la noche anterior o siguiente) ocupa sus mesas
+    schedule = Schedule()
+    for reservation in reservations:
+        if reservation.id not in target_ids and reservation.table_id is not None:
+            schedule.add([reservation.table_id, *extras.get(reservation.id, [])],
+                         reservation.start_date_time, reservation.end_date_time)
+
+    requests = [(r.id, r.quantity, r.start_date_time, r.end_date_time) for r in targets]
+    plan = best_fit_decreasing(requests, options, schedule)
+    solver = "heuristic"
+
+    if exact == "always" or (exact == "auto" and len(requests) <= EXACT_LIMIT):
+        # best_fit_decreasing dejó sus asignaciones en schedule; se quitan para la búsqueda exacta
+        for reservation_id, _, start, end in requests:
+            if plan[reservation_id] is not None:
+                schedule.remove(plan[reservation_id].tables, start, end)
+        plan = exact_assignment(requests, options, schedule, plan)
+        solver = "exact"
+
+    # El resultado se arma antes del commit, que expira los objetos cargados
+    numbers = {table_id: number for table_id, number, _ in tables}
+    assigned = []
+    unassigned = []
+    seats_wasted = 0
+    for reservation in targets:
+        option = plan[reservation.id]
+        item = {
+            "reservation_id": reservation.id,
+            "guest_name": reservation.guest_name,
+            "quantity": reservation.quantity,
+            "start_date_time": reservation.start_date_time.isoformat()
+        }
+        if option is None:
+            unassigned.append(item)
+            continue
+        seats_wasted += option.chairs - reservation.quantity
+        assigned.append({
+            **item,
+            "table_id": option.tables[0],
+            "extra_table_ids": list(option.tables[1:]),
+            "table_numbers": [numbers[table_id] for table_id in option.tables],
+            "chairs": option.chairs
+        })
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        if reassign and target_ids:
+            # Se liberan primero todas las mesas para no chocar con la restricción de superposición
+            db.session.execute(
+                delete(ReservationExtraTable).where(ReservationExtraTable.reservation_id.in_(target_ids)))
+            for reservation in targets:
+                reservation.table_id = None
+            db.session.flush()
+
+        for reservation in targets:
+            option = plan[reservation.id]
+            if option is None:
+                continue
+            reservation.table_id = option.tables[0]
+            for table_id in option.tables[1:]:
+                db.session.add(ReservationExtraTable(reservation_id=reservation.id, table_id=table_id))
+
+        db.session.commit()
+        availability.invalidate(day_start)
+
+    return {
+        "date": day.isoformat(),
+        "solver": solver,
+        "dry_run": dry_run,
+        "assigned": assigned,
+        "unassigned": unassigned,
+        "seats_wasted": seats_wasted,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -1,8 +1,12 @@
 import os
 from flask import jsonify, url_for, render_template
 import smtplib
+import time
+import threading
 import traceback
+from contextlib import contextmanager
 from email.message import EmailMessage
+from datetime import datetime, timedelta
 
 
 class APIException(Exception):
@@ -49,8 +53,43 @@ def generate_sitemap(app):
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
 
 
-def send_email(to_email, subject, body, is_html=False):
-    try:
+def build_message(to_email, subject, body, is_html=False):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = os.getenv("MAIL_USERNAME")
+    msg["To"] = to_email
+    # msg["Bcc"] = smtp_user  # Copia oculta al remitente
+
+    if is_html:
+        msg.set_content("Tu cliente de correo no soporta HTML.")
+        msg.add_alternative(body, subtype="html")
+    else:
+        msg.set_content(body)
+    return msg
+
+
+# Segundos de espera de cada operación SMTP (conexión, envío)
+SMTP_TIMEOUT = int(os.getenv("MAIL_TIMEOUT_SECONDS", 30))
+
+
+class SMTPPool:
+    """
+    Conexiones SMTP reutilizables (ya con STARTTLS y login) por proceso.
+    Una conexión que estuvo inactiva más de `check_after` segundos se prueba con NOOP
+    antes de usarla; se descarta tras `max_messages` envíos o `max_idle` segundos sin uso.
+    """
+
+    def __init__(self, size=4, max_messages=100, check_after=30, max_idle=300):
+        self.size = size
+        self.max_messages = max_messages
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._pid = os.getpid()
+
+    def _connect(self):
         smtp_server = os.getenv("MAIL_SERVER")
         smtp_port = int(os.getenv("MAIL_PORT", 587))
         smtp_user = os.getenv("MAIL_USERNAME")
@@ -59,23 +98,144 @@ def send_email(to_email, subject, body, is_html=False):
         if not smtp_server or not smtp_user or not smtp_pass:
             raise ValueError("Faltan variables de entorno para configurar el correo")
 
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = smtp_user
-        msg["To"] = to_email
-        # msg["Bcc"] = smtp_user  # Copia oculta al remitente
+        smtp = smtplib.SMTP(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
+        smtp.starttls()
+        smtp.login(smtp_user, smtp_pass)
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _healthy(self, smtp, last_used):
+        idle = time.monotonic() - last_used
+        if idle > self.max_idle:
+            return False
+        if idle <= self.check_after:
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                # Las conexiones heredadas por fork no se pueden compartir con el proceso padre
+                if self._pid != os.getpid():
+                    self._idle = []
+                    self._pid = os.getpid()
+                if not self._idle:
+                    break
+                smtp, sent, last_used = self._idle.pop()
+
+            if self._healthy(smtp, last_used):
+                return [smtp, sent]
+            self._close(smtp)
+
+        return [self._connect(), 0]
+
+    def _release(self, connection, broken=False):
+        smtp, sent = connection
+        if broken or sent >= self.max_messages:
+            self._close(smtp)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((smtp, sent, time.monotonic()))
+                return
+        self._close(smtp)
 
-        if is_html:
-            msg.set_content("Tu cliente de correo no soporta HTML.")
-            msg.add_alternative(body, subtype="html")
-        else:
-            msg.set_content(body)
+    @contextmanager
+    def connection(self):
+        """Conexión como lista [smtp, enviados]; quien envía debe sumar a enviados."""
+        with self._slots:
+            connection = self._acquire()
+            try:
+                yield connection
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._release(connection, broken=True)
+                raise
+            except BaseException:
+                self._release(connection)
+                raise
+            else:
+                self._release(connection)
 
-        with smtplib.SMTP(smtp_server, smtp_port) as smtp:
-            smtp.starttls()
-            smtp.login(smtp_user, smtp_pass)
-            smtp.send_message(msg)
+    def send_many(self, messages, on_result=None):
+        """
+        Envía los EmailMessage de `messages` reutilizando conexiones.
+        Devuelve una lista con None (enviado) o la excepción de cada mensaje, en el mismo orden;
+        `on_result(índice, error)` se llama después de cada envío.
+        """
+        results = []
+        pending = list(messages)
+        while len(results) < len(pending):
+            try:
+                with self.connection() as connection:
+                    while len(results) < len(pending):
+                        if connection[1] >= self.max_messages:
+                            break
+                        message = pending[len(results)]
+                        try:
+                            connection[0].send_message(message)
+                            error = None
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                smtplib.SMTPDataError) as e:
+                            # Rechazo de este mensaje: la conexión sigue sirviendo para los demás
+                            error = e
+                        connection[1] += 1
+                        results.append(error)
+                        if on_result:
+                            on_result(len(results) - 1, error)
+            except Exception as e:
+                # Conexión caída o imposible de abrir: el mensaje actual falla y se sigue con otra
+                results.append(e)
+                if on_result:
+                    on_result(len(results) - 1, e)
+        return results
 
+    def send(self, message):
+        error = self.send_many([message])[0]
+        if error is not None:
+            raise error
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _, _ in idle:
+            self._close(smtp)
+
+
+smtp_pool = SMTPPool(
+    size=int(os.getenv("MAIL_POOL_SIZE", 4)),
+    max_messages=int(os.getenv("MAIL_MAX_MESSAGES_PER_CONNECTION", 100)),
+    check_after=int(os.getenv("MAIL_NOOP_AFTER_SECONDS", 30)),
+    max_idle=int(os.getenv("MAIL_MAX_IDLE_SECONDS", 300))
+)
+
+
+def deliver_email(to_email, subject, body, is_html=False):
+    """Envía un correo por SMTP; a diferencia de send_email, lanza la excepción si falla."""
+    smtp_pool.send(build_message(to_email, subject, body, is_html))
+
+
+def send_many(emails, on_result=None):
+    """
+    Envío en lote: `emails` es una lista de (to_email, subject, body, is_html).
+    Devuelve None o la excepción de cada correo, en el mismo orden.
+    """
+    return smtp_pool.send_many([build_message(*email) for email in emails], on_result)
+
+
+def send_email(to_email, subject, body, is_html=False):
+    try:
+        deliver_email(to_email, subject, body, is_html)
         return True  # Envío exitoso
 
     except Exception as e:
@@ -97,8 +257,6 @@ def send_email_reservation(data):
 
         subject = f"Nueva solicitud de Reserva de {guest_name}"
 
-        admin_email = os.getenv('MAIL_USERNAME')
-
         html_user_body = render_template("email_confirmacion_reserva_usuario.html", guest_name=guest_name,
                                          guest_phone=guest_phone, quantity=quantity,
                                          start_date_time=start_date_time, additional_details=additional_details)
@@ -106,10 +264,26 @@ def send_email_reservation(data):
                                           guest_phone=guest_phone, quantity=quantity,
                                           start_date_time=start_date_time, additional_details=additional_details)
 
-        send_email(email, "¡Tu solicitud de reserva fue recibida!", html_user_body, is_html=True)
-        send_email(admin_email, subject, html_admin_body, is_html=True)
+        from api.outbox import queue_email
+        from api.admin_digest import notify_admin
+
+        # Una reserva para las próximas horas no puede esperar al resumen del admin
+        category = "reserva"
+        try:
+            starts_in = datetime.strptime(start_date_time, "%Y-%m-%d %H:%M:%S") - datetime.now()
+            if starts_in < timedelta(hours=int(os.getenv("ADMIN_URGENT_RESERVATION_HOURS", 3))):
+                category = "reserva_proxima"
+        except (TypeError, ValueError):
+            pass
+
+        user_queued = queue_email(email, "¡Tu solicitud de reserva fue recibida!", html_user_body, is_html=True)
+        admin_queued = notify_admin(
+            category, subject, html_admin_body,
+            summary=f"{guest_name} ({guest_phone}), {quantity} personas, {start_date_time}"
+                    + (f"\n{additional_details}" if additional_details else "")
+        )
 
-        return True  # o return {"status": "success"}
+        return user_queued and admin_queued
 
     except Exception as e:
         print(f"Error enviando correo: {e}")
@@ -3,14 +3,27 @@ This module takes care of starting the API Server, Loading the DB and Adding the
 """
 import os
 from flask import Flask, request, jsonify, url_for, send_from_directory, render_template
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_migrate import Migrate
 from flask_swagger import swagger
-from api.utils import APIException, generate_sitemap, send_email
+from api.utils import APIException, generate_sitemap
 from api.models import db, User, user_role, Dishes, dish_type, Drinks, drink_type
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
-from flask_jwt_extended import create_access_token, JWTManager, get_jwt_identity, jwt_required, get_jwt
+from api.query_stats import setup_query_stats
+from api.menu_cache import menu_cache
+from api.pagination import keyset_page
+from api.counters import list_total, page_count
+from api.outbox import queue_email
+from api.admin_digest import notify_admin
+from api.passwords import password_hasher, PasswordHasherBusy
+from api.rate_limit import login_throttle
+from api.search import search_filter
+from api.identity import (issue_token, issue_verification_token, verification_token_required, token_allowed,
+                          current_user, current_user_id, user_cache, role_required)
+from api.revocation import revocation_list
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from datetime import timedelta
@@ -22,9 +35,34 @@ static_file_dir = os.path.join(os.path.dirname(
 
 app = Flask(__name__)
 
+# Cantidad de proxies delante de la app (Render agrega uno). remote_addr pasa a ser la IP que
+# agregó el último proxy confiable en X-Forwarded-For, no una que pueda inventar el cliente.
+trusted_proxies = int(os.getenv("TRUSTED_PROXIES", 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
 app.config["JWT_SECRET_KEY"] = "da_secre_qi"
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=24)
 jwt = JWTManager(app)
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    # Se resuelve en memoria; la lista se sincroniza con revoked_tokens cada pocos segundos
+    return revocation_list.is_revoked(jwt_payload)
+
+
+@jwt.token_verification_loader
+def check_token_purpose(jwt_header, jwt_payload):
+    # Un token de verificación de email solo sirve para /verify-email (ver api/identity.py)
+    return token_allowed(jwt_payload)
+
+
+@jwt.token_verification_failed_loader
+def token_purpose_rejected(jwt_header, jwt_payload):
+    return jsonify({"msg": "Token no válido para esta ruta"}), 401
+
+
 CORS(app)
 bcrypt = Bcrypt(app)
 app.url_map.strict_slashes = False
@@ -50,6 +88,9 @@ setup_admin(app)
 # add the admin
 setup_commands(app)
 
+# Cantidad y tiempo de las consultas SQL de cada request (headers X-DB-Queries y Server-Timing)
+setup_query_stats(app)
+
 # Add all endpoints form the API with a "api" prefix
 app.register_blueprint(api, url_prefix='/api')
 
@@ -58,14 +99,7 @@ app.register_blueprint(api, url_prefix='/api')
 
 
 def generate_verification_token(user_id):
-    additional_claims = {"user_id": user_id}
-
-    token = create_access_token(
-        identity=str(user_id),
-        additional_claims=additional_claims,
-        expires_delta=timedelta(hours=24)
-    )
-    return token
+    return issue_verification_token(user_id)
 
 
 def send_verification_email(user_email, user_id):
@@ -80,8 +114,8 @@ def send_verification_email(user_email, user_id):
     html_body = render_template(
         "email_verification.html", verification_url=verification_url)
 
-    send_email(user_email, "Verifica tu correo electrónico",
-               html_body, is_html=True)
+    queue_email(user_email, "Verifica tu correo electrónico",
+                html_body, is_html=True)
 
 # Handle/serialize errors like a JSON object
 
@@ -144,7 +178,7 @@ def handle_register():
 
         role = user_role(role_str)
         print(role)
-        password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        password_hash = password_hasher.hash(password)
 
         new_user = User(name=name, last_name=last_name, phone_number=phone_number,
                         email=email, password=password_hash, role=role, is_active=False)
@@ -154,6 +188,8 @@ def handle_register():
         send_verification_email(new_user.email, new_user.id)
 
         return jsonify({"ok": True, "msg": "Register was successfull..."}), 201
+    except PasswordHasherBusy as e:
+        return jsonify({"ok": False, "msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
     except Exception as e:
         print("Error:", str(e))
         db.session.rollback()
@@ -165,8 +201,8 @@ def handle_register():
 @app.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
-    user_email = get_jwt_identity()
-    user = db.session.scalar(db.select(User).where(User.email == user_email))
+    # Sale del cache de usuarios: no consulta la base en cada request
+    user = current_user()
 
     if user is None:
         return jsonify({"error": "Usuario no encontrado"}), 404
@@ -184,8 +220,8 @@ def get_profile():
 @app.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
-    user_email = get_jwt_identity()
-    user = db.session.scalar(db.select(User).where(User.email == user_email))
+    user_id = current_user_id()
+    user = db.session.get(User, user_id) if user_id else None
 
     if user is None:
         return jsonify({"error": "Usuario no encontrado"}), 404
@@ -197,6 +233,7 @@ def update_profile():
     user.email = data.get("email", user.email)
 
     db.session.commit()
+    user_cache.invalidate(user.id)
 
     return jsonify({"msg": "Perfil actualizado correctamente"}), 200
 
@@ -204,7 +241,7 @@ def update_profile():
 
 
 @app.route("/verify-email", methods=['POST'])
-@jwt_required()
+@verification_token_required
 def handle_verify_email():
     try:
         # Obtener el user_id desde los claims adicionales
@@ -214,16 +251,20 @@ def handle_verify_email():
         user = db.session.scalar(db.select(User).where(User.id == user_id))
         user.is_active = True
         db.session.commit()
+        user_cache.invalidate(user.id)
         return jsonify({"msg": "Correo verificado correctamente"}), 200
     except Exception as e:
         return jsonify({"msg": "Ocurrió un error al validar la cuenta"}), 500
 
 
 @app.route('/login', methods=['POST'])
+@login_throttle
 def handle_login():
     try:
         data = request.get_json(silent=True)
         print("Data del body", data)
+        if not isinstance(data, dict):
+            return jsonify({"msg": "Correo y contraseña requeridos"}), 400
 
         email = data.get("email")
         password = data.get("password")
@@ -238,16 +279,48 @@ def handle_login():
         if not user.is_active:
             return jsonify({"msg": "Debe verificar su correo electrónico"}), 403
         
-        if not bcrypt.check_password_hash(user.password, password):
+        if not password_hasher.verify_and_update(user, password):
             return jsonify({"msg": "El correo o la contraseña son incorrectos"}), 401
+        # Guarda el hash recalculado si cambió BCRYPT_LOG_ROUNDS
+        db.session.commit()
 
         # after confirminh the details are valid, generate the token
+        # identity = id del usuario; rol, email y versión van como claims (ver api/identity.py)
         user_role = user.role.value
-        claims = {"role": user_role, "more details": "the details"}
-        access_token = create_access_token(
-            identity=str(email), additional_claims=claims)
+        access_token = issue_token(user)
 
         return jsonify({"ok": True, "msg": "¡Login exitoso!", "access_token": access_token, "role": user_role}), 200
+    except PasswordHasherBusy as e:
+        return jsonify({"ok": False, "msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        print("Error:", str(e))
+        db.session.rollback()
+        return jsonify({"ok": False, "msg": str(e)}), 500
+
+
+@app.route('/logout', methods=['POST'])
+@jwt_required()
+def handle_logout():
+    try:
+        revocation_list.revoke_token(get_jwt())
+        return jsonify({"ok": True, "msg": "Sesión cerrada"}), 200
+    except Exception as e:
+        print("Error:", str(e))
+        db.session.rollback()
+        return jsonify({"ok": False, "msg": str(e)}), 500
+
+# Cierra todas las sesiones abiertas de un usuario (solo admin)
+
+
+@app.route('/users/<int:user_id>/revoke-sessions', methods=['POST'])
+@role_required(user_role.ADMIN.value)
+def revoke_user_sessions(user_id):
+    try:
+        if db.session.get(User, user_id) is None:
+            return jsonify({"msg": "Usuario no encontrado"}), 404
+
+        revocation_list.revoke_user(user_id)
+        return jsonify({"ok": True, "msg": "Sesiones del usuario revocadas"}), 200
     except Exception as e:
         print("Error:", str(e))
         db.session.rollback()
@@ -286,8 +359,8 @@ def edit_user(user_id):
                 return jsonify({"msg": "El correo electrónico ya está en uso"}), 400
             user.email = email
         if password:
-            user.password = bcrypt.generate_password_hash(
-                password).decode("utf-8")
+            user.password = password_hasher.hash(password)
+            user.token_version += 1
         if role_str:
             valid_roles = [r.value for r in user_role]
             if role_str not in valid_roles:
@@ -295,11 +368,18 @@ def edit_user(user_id):
                     "msg": "Rol inválido",
                     "valid_roles": valid_roles
                 }), 400
-            user.role = user_role(role_str)
+            if user.role != user_role(role_str):
+                user.role = user_role(role_str)
+                # Los tokens emitidos con el rol anterior dejan de valer como fuente del rol
+                user.token_version += 1
 
         db.session.commit()
+        user_cache.invalidate(user.id)
 
         return jsonify({"ok": True, "msg": "Usuario actualizado correctamente"}), 200
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": f"Error al actualizar usuario: {str(e)}"}), 500
@@ -326,6 +406,7 @@ def delete_user():
 
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(user.id)
 
         return jsonify({"ok": True, "msg": f"Usuario con email {email} eliminado correctamente"}), 200
 
@@ -343,6 +424,7 @@ def listar_usuarios():
         is_active_param = request.args.get("is_active")
         role_param = request.args.get("role")
         email_search = request.args.get("email", "").strip()
+        search = request.args.get("search", "").strip()
 
         stmt_base = select(User)
 
@@ -364,12 +446,31 @@ def listar_usuarios():
             except KeyError:
                 return jsonify({"error": f"Rol inválido. Debe ser uno de: {[r.name for r in user_role]}"}), 400
 
-        # Filtro por email (búsqueda parcial, insensible a mayúsculas)
-        if email_search:
-            stmt_base = stmt_base.where(User.email.ilike(f"%{email_search}%"))
+        # Búsqueda por nombre, apellido o email (BookingForm manda email, AdminUsers search),
+        # sobre el índice de api/search.py
+        for term in (email_search, search):
+            if term:
+                stmt_base = stmt_base.where(search_filter(User, term))
+
+        if "cursor" in request.args:
+            try:
+                users, next_cursor, prev_cursor = keyset_page(
+                    stmt_base, User.created_at, User.id, request.args["cursor"], per_page, descending=True)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            return jsonify({
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "items": [user.serialize() for user in users]
+            }), 200
 
         # Total con filtros
-        total = db.session.scalar(select(func.count()).select_from(stmt_base.subquery()))
+        try:
+            total = list_total(stmt_base)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Paginación
         stmt = (
@@ -385,7 +486,7 @@ def listar_usuarios():
             "total": total,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": page_count(total, per_page),
             "items": [user.serialize() for user in users]
         }), 200
 
@@ -444,6 +545,7 @@ def handle_add_dish():
 
         db.session.add(new_dish)
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify({"ok": True, "msg": "Register dish was successfull..."}), 201
     except Exception as e:
@@ -455,10 +557,7 @@ def handle_add_dish():
 @app.route('/dishes', methods=['GET'])
 def get_all_dishes():
     try:
-        dishes = Dishes.query.all()
-        dish_list = [dish.serialize() for dish in dishes]
-
-        return jsonify(dish_list), 200
+        return menu_cache.response("dishes", lambda: [dish.serialize() for dish in Dishes.query.all()])
 
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
@@ -498,6 +597,7 @@ def update_dish(dish_id):
             dish.type = data["type"]
 
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify(dish.serialize()), 200
 
@@ -514,6 +614,7 @@ def delete_dish(dish_id):
 
         db.session.delete(dish)
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify({"ok": True, "msg": "Platillo eliminado exitosamente"}), 200
 
@@ -558,6 +659,7 @@ def handle_add_drink():
 
         db.session.add(new_drink)
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify({"ok": True, "msg": "Register drink was successfull..."}), 201
     except Exception as e:
@@ -569,10 +671,7 @@ def handle_add_drink():
 @app.route('/drinks', methods=['GET'])
 def get_all_drinks():
     try:
-        drinks = Drinks.query.all()
-        drink_list = [drink.serialize() for drink in drinks]
-
-        return jsonify(drink_list), 200
+        return menu_cache.response("drinks", lambda: [drink.serialize() for drink in Drinks.query.all()])
 
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "message": str(e)}), 500
@@ -612,6 +711,7 @@ def update_drink(drink_id):
             drink.type = data["type"]
 
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify(drink.serialize()), 200
 
@@ -628,6 +728,7 @@ def delete_drink(drink_id):
 
         db.session.delete(drink)
         db.session.commit()
+        menu_cache.invalidate()
 
         return jsonify({"ok": True, "msg": "Bebida eliminada correctamente"}), 200
     except Exception as e:
@@ -652,15 +753,14 @@ def handle_send_email_contacto():
             return jsonify({"error": "Se requieren los campos: name, email y message"}), 400
 
         subject = f"Nuevo mensaje de contacto de {name}"
-        admin_email = os.getenv("MAIL_USERNAME")
 
         # Cuerpo HTML
         html_user_body = render_template("email_pagina_contacto.html", name=name)
         html_admin_body = render_template("email_pagina_contacto_admin.html", name=name, message=message, email=email)
 
-        # Enviar correos y verificar resultado
-        user_sent = send_email(email, "Gracias por contactarnos", html_user_body, is_html=True)
-        admin_sent = send_email(admin_email, subject, html_admin_body, is_html=True)
+        # Encolar correos y verificar resultado
+        user_sent = queue_email(email, "Gracias por contactarnos", html_user_body, is_html=True)
+        admin_sent = notify_admin("contacto", subject, html_admin_body, summary=f"{name} <{email}>\n{message}")
 
         if not user_sent or not admin_sent:
             return jsonify({
@@ -689,7 +789,7 @@ def init_admin_db():
     if existing:
         return jsonify({"msg": "El usuario admin ya existe"}), 200
 
-    hashed_password = bcrypt.generate_password_hash(os.getenv("ADMIN_PASSWORD", "admin123")).decode('utf-8')
+    hashed_password = password_hasher.hash(os.getenv("ADMIN_PASSWORD", "admin123"))
 
     admin = User(
         name="Admin",
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import itertools
+import pytest
+
+# La app lee la configuración del entorno al importarse: todo esto va antes de `from app import app`
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="gastro-click-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["FRONTEND_URL"] = "http://localhost:3000"
+os.environ["MAIL_USERNAME"] = "admin@example.com"
+# Correos a la outbox (nunca SMTP), hash en el request con costo mínimo y eventos en memoria
+os.environ["EMAIL_DELIVERY"] = "outbox"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["BCRYPT_LOG_ROUNDS"] = "4"
+os.environ["EVENTS_BACKEND"] = "local"
+os.environ["LOGIN_RATE_LIMIT_IP"] = "1000/60"
+os.environ["LOGIN_RATE_LIMIT_EMAIL"] = "1000/60"
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+_emails = itertools.count(1)
+_table_numbers = itertools.count(1000)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from flask_migrate import upgrade
+    from app import app
+
+    app.config["TESTING"] = True
+    # El esquema sale de las migraciones (triggers FTS5 incluidos), no de create_all
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Crea un usuario activo y devuelve (id, headers con su token de sesión)."""
+    from api.models import db, User, user_role
+    from api.identity import issue_token
+
+    def make(role="CLIENTE", active=True):
+        with app.app_context():
+            user = User(
+                name="Test", last_name="User", phone_number="555-0000",
+                email=f"user{next(_emails)}@example.com", password="x",
+                role=user_role(role), is_active=active
+            )
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {"Authorization": f"Bearer {issue_token(user)}"}
+
+    return make
+
+
+@pytest.fixture
+def make_table(app):
+    from api.models import db, Table, table_status
+
+    def make(chairs=4):
+        with app.app_context():
+            table = Table(number=next(_table_numbers), chairs=chairs, status=table_status.LIBRE)
+            db.session.add(table)
+            db.session.commit()
+            return table.id
+
+    return make
+
+
+@pytest.fixture
+def dish_id(app):
+    from api.models import db, Dishes, dish_type
+
+    with app.app_context():
+        dish = Dishes(name=f"Tacos {next(_emails)}", description="Al pastor", url_img="https://example.com/t.png",
+                      price=12.5, type=dish_type.PRINCIPAL, is_active=True)
+        db.session.add(dish)
+        db.session.commit()
+        return dish.id
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from flask_jwt_extended import create_access_token
+from api.models import db, User
+from api.identity import issue_verification_token
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def verification_headers(app, user_id, legacy=False):
+    with app.app_context():
+        if legacy:
+            # Formato anterior al claim purpose
+            return bearer(create_access_token(
+                identity=str(user_id), additional_claims={"user_id": user_id}, expires_delta=timedelta(hours=24)))
+        return bearer(issue_verification_token(user_id))
+
+
+def test_session_token_opens_the_profile(client, make_user):
+    _, headers = make_user()
+    assert client.get("/api/profile", headers=headers).status_code == 200
+    assert client.get("/profile", headers=headers).status_code == 200
+
+
+def test_verification_token_is_not_a_session(app, client, make_user):
+    admin_id, _ = make_user("ADMIN", active=False)
+
+    for legacy in (False, True):
+        headers = verification_headers(app, admin_id, legacy=legacy)
+        assert client.get("/api/profile", headers=headers).status_code == 401
+        assert client.get("/profile", headers=headers).status_code == 401
+        assert client.get("/api/identity/stats", headers=headers).status_code == 401
+        assert client.get("/api/cocina/stream/stats", headers=headers).status_code == 401
+
+
+def test_verify_email_accepts_only_verification_tokens(app, client, make_user):
+    user_id, session_headers = make_user(active=False)
+
+    assert client.post("/api/verify-email", headers=session_headers).status_code == 401
+
+    response = client.post("/api/verify-email", headers=verification_headers(app, user_id))
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(User, user_id).is_active
+
+
+def test_login_right_after_revoking_sessions_is_accepted(app, client, make_user):
+    import time
+    from api.identity import issue_token
+
+    user_id, _ = make_user()
+    _, admin_headers = make_user("ADMIN")
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        claims = {"role": user.role.value, "email": user.email, "ver": user.token_version}
+        old = bearer(create_access_token(identity=str(user_id), additional_claims={**claims, "iat": int(time.time()) - 5}))
+
+    assert client.post(f"/users/{user_id}/revoke-sessions", headers=admin_headers).status_code == 200
+
+    with app.app_context():
+        fresh = bearer(issue_token(db.session.get(User, user_id)))
+
+    assert client.get("/api/profile", headers=old).status_code == 401
+    assert client.get("/api/profile", headers=fresh).status_code == 200
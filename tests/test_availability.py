@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+import api.availability
+from api.availability import AvailabilityIndex
+from tests.test_reservations import booking
+
+
+def free_tables(client, day, time, party=2):
+    response = client.get(f"/api/availability?date={day}&time={time}&party={party}")
+    assert response.status_code == 200
+    return [table["id"] for table in response.get_json()["tables"]]
+
+
+def test_availability_uses_the_stored_end_of_each_booking(client, make_table, monkeypatch):
+    table_id = make_table()
+
+    # Reserva hecha cuando el turno duraba 3 horas; después se vuelve a 2
+    monkeypatch.setattr(api.availability, "SEATING_DURATION", timedelta(minutes=180))
+    assert client.post("/api/reservations", json=booking(table_id, "2031-04-01 20:00:00")).status_code == 201
+    monkeypatch.setattr(api.availability, "SEATING_DURATION", timedelta(minutes=120))
+
+    assert table_id not in free_tables(client, "2031-04-01", "22:00")
+    assert client.post("/api/reservations", json=booking(table_id, "2031-04-01 22:00:00")).status_code == 409
+
+    assert table_id in free_tables(client, "2031-04-01", "23:00")
+    assert client.post("/api/reservations", json=booking(table_id, "2031-04-01 23:00:00")).status_code == 201
+
+
+def test_assign_tables_plans_around_stored_ends(client, make_table, monkeypatch):
+    small = make_table(chairs=2)
+
+    monkeypatch.setattr(api.availability, "SEATING_DURATION", timedelta(minutes=180))
+    assert client.post("/api/reservations", json=booking(small, "2031-04-02 20:00:00")).status_code == 201
+    monkeypatch.setattr(api.availability, "SEATING_DURATION", timedelta(minutes=120))
+    assert client.post("/api/reservations", json=booking(None, "2031-04-02 22:00:00")).status_code == 201
+
+    result = client.post("/api/reservations/assign-tables", json={"date": "2031-04-02", "dry_run": True}).get_json()
+    assert [item["table_id"] for item in result["assigned"]] != [small]
+    assert not result["unassigned"]
+
+
+def test_build_racing_an_invalidation_is_not_cached(app, monkeypatch):
+    index = AvailabilityIndex(ttl=60)
+    build = index._build
+
+    def build_then_invalidate(day):
+        built = build(day)
+        # Una reserva se escribe mientras se arma el índice
+        index.invalidate()
+        return built
+
+    monkeypatch.setattr(index, "_build", build_then_invalidate)
+    with app.app_context():
+        index.day(date(2031, 4, 3))
+    assert date(2031, 4, 3) not in index._days
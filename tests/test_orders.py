@@ -0,0 +1,70 @@
+import uuid
+from sqlalchemy import select, func
+from api.models import db, Order
+
+
+def order_body(dish_id, quantity=1):
+    return {"dishes": [{"id": dish_id, "quantity": quantity}]}
+
+
+def test_counters_match_exact_totals_after_bulk_patch(client, make_user, dish_id):
+    _, headers = make_user()
+    ids = [client.post("/api/orders", json=order_body(dish_id), headers=headers).get_json()["order"]["id"]
+           for _ in range(5)]
+
+    response = client.patch("/api/cocina/ordenes", json={"orders": [
+        {"id": ids[0], "status": "COMPLETADA"},
+        {"id": ids[1], "status": "COMPLETADA"},
+        {"id": ids[2], "status": "CANCELADA"},
+        {"id": ids[3], "status": "EN_PROCESO"},
+        {"id": 999999, "status": "COMPLETADA"}
+    ]})
+    assert response.status_code == 200
+    results = {item["id"]: item["result"] for item in response.get_json()["results"]}
+    assert results[999999] == "not_found"
+
+    for status in ("EN_PROCESO", "COMPLETADA", "CANCELADA"):
+        estimate = client.get(f"/api/orders?status={status}").get_json()["total"]
+        exact = client.get(f"/api/orders?status={status}&count=exact").get_json()["total"]
+        assert estimate == exact, status
+
+
+def test_idempotent_replay_returns_the_same_order(app, client, make_user, dish_id):
+    _, headers = make_user()
+    _, other_headers = make_user()
+    key = {"Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/api/orders", json=order_body(dish_id, 2), headers={**headers, **key})
+    replay = client.post("/api/orders", json=order_body(dish_id, 2), headers={**headers, **key})
+    assert first.status_code == replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.get_json() == first.get_json()
+
+    order_code = first.get_json()["order"]["ordenId"]
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).where(Order.order_code == order_code)) == 1
+
+    # La misma clave y el mismo body de otro usuario no reciben la orden ajena
+    foreign = client.post("/api/orders", json=order_body(dish_id, 2), headers={**other_headers, **key})
+    assert foreign.status_code == 422
+
+
+def test_kitchen_streams_are_capped(client, make_user, monkeypatch):
+    import threading
+    from api.routes import kitchen
+
+    monkeypatch.setattr(kitchen, "stream_slots", threading.BoundedSemaphore(1))
+    _, headers = make_user("COCINA")
+
+    first = client.get("/api/cocina/stream", headers=headers, buffered=False)
+    assert first.status_code == 200
+
+    full = client.get("/api/cocina/stream", headers=headers, buffered=False)
+    assert full.status_code == 503
+    assert full.headers["Retry-After"]
+
+    # Cerrar la conexión libera el lugar aunque no se haya leído nada
+    first.close()
+    again = client.get("/api/cocina/stream", headers=headers, buffered=False)
+    assert again.status_code == 200
+    again.close()
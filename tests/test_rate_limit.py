@@ -0,0 +1,31 @@
+import pytest
+from api.rate_limit import LocalStore
+
+
+@pytest.mark.parametrize("url", ["/login", "/api/login"])
+@pytest.mark.parametrize("body", ["[1]", '"admin@example.com"', "null"])
+def test_login_rejects_json_that_is_not_an_object(client, url, body):
+    response = client.post(url, data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_local_store_stays_under_max_keys():
+    store = LocalStore(max_keys=50)
+
+    for number in range(1000):
+        store.take(f"login:email:{number}@example.com", 5, 5 / 300)
+
+    assert len(store._buckets) <= 50
+    assert len(store._expiry) <= 2 * 50
+
+
+def test_local_store_keeps_the_limit_of_a_hot_key():
+    store = LocalStore(max_keys=50)
+
+    waits = [store.take("login:ip:10.0.0.1", 5, 5 / 300) for _ in range(200)]
+
+    assert waits[:5] == [0] * 5
+    assert all(wait > 0 for wait in waits[5:])
+    assert len(store._expiry) <= 2 * 50
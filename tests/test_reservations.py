@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, func
+from api.models import db, Reservation, reservation_status
+
+
+def booking(table_id, start, guest_name="Ana Pérez"):
+    return {
+        "guest_name": guest_name,
+        "guest_phone": "555-1234",
+        "email": "ana@example.com",
+        "quantity": 2,
+        "table_id": table_id,
+        "start_date_time": start
+    }
+
+
+def test_overlapping_booking_returns_409_with_the_conflict(client, make_table):
+    table_id = make_table()
+
+    first = client.post("/api/reservations", json=booking(table_id, "2031-01-10 20:00:00"))
+    assert first.status_code == 201
+
+    overlapping = client.post("/api/reservations", json=booking(table_id, "2031-01-10 21:00:00"))
+    assert overlapping.status_code == 409
+    assert overlapping.get_json()["conflict"]["id"] == first.get_json()["reservation_id"]
+
+    # El turno termina a las 22:00: la siguiente reserva puede empezar justo ahí
+    after = client.post("/api/reservations", json=booking(table_id, "2031-01-10 22:00:00"))
+    assert after.status_code == 201
+
+
+def test_concurrent_bookings_leave_one_winner_per_table_and_slot(app, make_table):
+    tables = [make_table() for _ in range(4)]
+    slots = [f"2031-02-0{day} 20:00:00" for day in range(1, 6)]
+    attempts = [(table_id, slot) for table_id in tables for slot in slots] * 10
+    assert len(attempts) == 200
+
+    def book(attempt):
+        # Un cliente por hilo: cada request tiene su propia sesión y conexión
+        return attempt, app.test_client().post("/api/reservations", json=booking(*attempt)).status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(book, attempts))
+
+    assert sorted({status for _, status in results}) == [201, 409]
+    for table_id in tables:
+        for slot in slots:
+            won = [status for attempt, status in results if attempt == (table_id, slot) and status == 201]
+            assert len(won) == 1
+
+    with app.app_context():
+        stored = db.session.execute(
+            select(Reservation.table_id, Reservation.start_date_time, func.count())
+            .where(Reservation.table_id.in_(tables), Reservation.status == reservation_status.PENDIENTE)
+            .group_by(Reservation.table_id, Reservation.start_date_time)
+        ).all()
+    assert len(stored) == len(tables) * len(slots)
+    assert all(count == 1 for _, _, count in stored)
+
+
+def test_guest_search_matches_without_accents(client, make_table):
+    table_id = make_table()
+    created = client.post("/api/reservations", json=booking(table_id, "2031-03-01 20:00:00", guest_name="José Núñez"))
+    assert created.status_code == 201
+
+    for term in ("nunez", "jos"):
+        found = client.get(f"/api/reservations?search={term}").get_json()["items"]
+        assert created.get_json()["reservation_id"] in [item["id"] for item in found]